@@ -0,0 +1,82 @@
+import hmac
+
+from flask import Blueprint, current_app, render_template, flash, redirect, request, url_for
+from flask_login import login_required, current_user
+
+from dbpool import pool_status
+from extensions import db, login_manager
+from jobs import job_counts
+from metrics import metrics_text
+from models import Jobs
+
+bp = Blueprint('admin', __name__)
+
+
+# One row per cache (per tier, for the two tier ones)
+def get_cache_stats():
+    rows = []
+    for name, cache in current_app.extensions['caches'].items():
+        stats = cache.stats()
+        if 'local' in stats:
+            rows.extend((f'{name} ({tier})', tier_stats) for tier, tier_stats in stats.items())
+        else:
+            rows.append((name, stats))
+    return rows
+
+
+@bp.route('/admin')
+@login_required
+def index():
+    id = current_user.id
+    if id == 9:
+        is_admin = True
+        cache_stats = get_cache_stats()
+        return render_template("admin.html", is_admin=is_admin, cache_stats=cache_stats)
+    else:
+        flash("Must be admin")
+        return redirect(url_for('users.dashboard'))
+
+
+# Connection pool numbers for this worker, as JSON
+@bp.route('/admin/pool')
+@login_required
+def pool():
+    id = current_user.id
+    if id == 9:
+        return pool_status(db.engine, current_app.extensions['pool_stats'])
+    else:
+        flash("Must be admin")
+        return redirect(url_for('users.dashboard'))
+
+
+# Background job queue: how many in each state, and the latest jobs
+@bp.route('/admin/jobs')
+@login_required
+def jobs():
+    id = current_user.id
+    if id == 9:
+        status = request.args.get('status')
+        query = Jobs.query.order_by(Jobs.date_added.desc())
+        if status:
+            query = query.filter_by(status=status)
+        return render_template("admin_jobs.html", is_admin=True, counts=job_counts(),
+                               status=status, jobs=query.limit(50).all())
+    else:
+        flash("Must be admin")
+        return redirect(url_for('users.dashboard'))
+
+
+# Prometheus metrics for every worker on this node. Admins, or a scraper
+# sending METRICS_TOKEN as a bearer token.
+@bp.route('/admin/metrics')
+def metrics():
+    token = current_app.config['METRICS_TOKEN']
+    sent = request.headers.get('Authorization', '')
+    if token and hmac.compare_digest(sent.encode(), f'Bearer {token}'.encode()):
+        pass
+    elif not current_user.is_authenticated:
+        return login_manager.unauthorized()
+    elif current_user.id != 9:
+        flash("Must be admin")
+        return redirect(url_for('users.dashboard'))
+    return metrics_text(), 200, {'Content-Type': 'text/plain; version=0.0.4; charset=utf-8'}
@@ -0,0 +1,79 @@
+import json
+from datetime import datetime
+from flask import Blueprint, Response, abort, request, stream_with_context
+from flask_login import login_required, current_user
+from sqlalchemy import select
+
+from extensions import db
+from models import Users, Posts
+
+bp = Blueprint('api', __name__, url_prefix='/api')
+
+# Rows fetched from the server-side cursor at a time
+BATCH_SIZE = 1000
+
+
+def parse_date(name):
+    value = request.args.get(name)
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(value)
+    except ValueError:
+        abort(400, f'{name} must be an ISO date')
+
+
+def to_json(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f'{type(value).__name__} is not JSON serializable')
+
+
+def ndjson(query):
+    # Stream rows straight from a server-side cursor, one JSON object per
+    # line, so only one batch is ever held in memory
+    def generate():
+        with db.engine.connect() as conn:
+            result = conn.execution_options(stream_results=True).execute(query)
+            for rows in result.mappings().partitions(BATCH_SIZE):
+                yield ''.join(json.dumps(dict(row), default=to_json) + '\n' for row in rows)
+
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+
+# Export blog posts
+# /api/posts?since=2023-01-01&until=2023-02-01&poster_id=3
+@bp.route('/posts')
+def posts():
+    query = (select(Posts.id, Posts.title, Posts.slug, Posts.content, Posts.date_posted,
+                    Posts.poster_id, Users.name.label('author'))
+             .outerjoin(Users, Posts.poster_id == Users.id)
+             .order_by(Posts.date_posted, Posts.id))
+    since = parse_date('since')
+    if since:
+        query = query.where(Posts.date_posted >= since)
+    until = parse_date('until')
+    if until:
+        query = query.where(Posts.date_posted < until)
+    poster_id = request.args.get('poster_id', type=int)
+    if poster_id is not None:
+        query = query.where(Posts.poster_id == poster_id)
+    return ndjson(query)
+
+
+# Export users (admin only, never the password hashes)
+@bp.route('/users')
+@login_required
+def users():
+    if current_user.id != 9:
+        abort(403)
+    query = (select(Users.id, Users.username, Users.name, Users.email, Users.favorite_color,
+                    Users.about_author, Users.date_added)
+             .order_by(Users.id))
+    since = parse_date('since')
+    if since:
+        query = query.where(Users.date_added >= since)
+    until = parse_date('until')
+    if until:
+        query = query.where(Users.date_added < until)
+    return ndjson(query)
@@ -0,0 +1,12 @@
+from uvicorn.middleware.wsgi import WSGIMiddleware
+
+from app import create_app
+
+# uvicorn asgi:app, or under gunicorn see gunicorn.conf.py
+#
+# The event loop holds the connections: it reads the whole request body
+# and writes the response out to the client, however slow either end is.
+# Only then does the request take one of ASGI_THREADS threads to run the
+# normal Flask app, so that many requests per worker run at once.
+flask_app = create_app()
+app = WSGIMiddleware(flask_app, workers=flask_app.config['ASGI_THREADS'])
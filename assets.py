@@ -0,0 +1,159 @@
+import base64
+import gzip
+import hashlib
+import json
+import os
+import shutil
+import urllib.request
+from mimetypes import guess_type
+
+import click
+from flask import current_app, request, send_from_directory, url_for
+from flask.cli import AppGroup
+
+try:
+    import brotli
+except ImportError:  # optional - without it we only make .gz files
+    brotli = None
+
+# Static assets
+#
+# `flask assets build` copies the vendor bundles we used to load from the
+# CDN into static/vendor, then writes every static file to static/dist
+# under a name containing its content hash, with .gz (and .br) versions
+# next to it, and a manifest mapping the plain names to the hashed ones.
+#
+# Templates link assets with asset_url('css/style.css'). Hashed files
+# never change, so they are served with a one year immutable cache.
+
+DIST = 'dist'
+MANIFEST = 'manifest.json'
+COMPRESSIBLE = {'.css', '.js', '.map', '.svg', '.json', '.txt', '.html'}
+IMMUTABLE = 'public, max-age=31536000, immutable'
+
+# Local name: (CDN url, subresource integrity hash)
+VENDOR = {
+    'vendor/bootstrap.min.css': (
+        'https://cdn.jsdelivr.net/npm/bootstrap@5.3.0-alpha1/dist/css/bootstrap.min.css',
+        'sha384-GLhlTQ8iRABdZLl6O3oVMWSktQOp6b7In1Zl3/Jr59b6EGGoI1aFkw7cmDA6j6gD'),
+    'vendor/popper.min.js': (
+        'https://cdn.jsdelivr.net/npm/@popperjs/core@2.11.6/dist/umd/popper.min.js',
+        'sha384-oBqDVmMz9ATKxIep9tiCxS/Z9fNfEXiDAYTujMAeBAsjFuCZSmKbSSUnQlmh/jp3'),
+    'vendor/bootstrap.min.js': (
+        'https://cdn.jsdelivr.net/npm/bootstrap@5.3.0-alpha1/dist/js/bootstrap.min.js',
+        'sha384-mQ93GR66B00ZXjt0YO5KlohRA5SY2XofN4zfuZxLkoj1gXtW8ANNCe9d5Y3eG5eD'),
+    'vendor/bootstrap.bundle.min.js': (
+        'https://cdn.jsdelivr.net/npm/bootstrap@5.3.0-alpha1/dist/js/bootstrap.bundle.min.js',
+        'sha384-w76AqPfDkMBDXo30jS1Sgez6pr3x5MlQ1ZAGC+nuZB+EYdgRZgiwxhTBTkF7CXvN'),
+}
+
+assets_group = AppGroup('assets', help='Build the static assets.')
+
+
+def integrity(data, algorithm='sha384'):
+    return f'{algorithm}-' + base64.b64encode(hashlib.new(algorithm, data).digest()).decode()
+
+
+def fetch_vendor(static_folder, offline=False):
+    for name, (url, expected) in VENDOR.items():
+        path = os.path.join(static_folder, name)
+        if os.path.exists(path):
+            continue
+        if offline:
+            raise click.ClickException(f'{name} is missing and --offline was given')
+        click.echo(f'Downloading {url}')
+        with urllib.request.urlopen(url, timeout=30) as response:
+            data = response.read()
+        if integrity(data, expected.split('-', 1)[0]) != expected:
+            raise click.ClickException(f'{url} does not match its integrity hash')
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wb') as f:
+            f.write(data)
+
+
+def fingerprint(static_folder, name):
+    with open(os.path.join(static_folder, name), 'rb') as f:
+        data = f.read()
+    root, ext = os.path.splitext(name)
+    hashed = f'{root}.{hashlib.sha256(data).hexdigest()[:12]}{ext}'
+    path = os.path.join(static_folder, DIST, hashed)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'wb') as f:
+        f.write(data)
+    if ext in COMPRESSIBLE:
+        with open(path + '.gz', 'wb') as f:
+            # mtime=0 so the same input always gives the same bytes
+            with gzip.GzipFile(fileobj=f, mode='wb', compresslevel=9, mtime=0) as gz:
+                gz.write(data)
+        if brotli is not None:
+            with open(path + '.br', 'wb') as f:
+                f.write(brotli.compress(data, quality=11))
+    return hashed
+
+
+@assets_group.command('build')
+@click.option('--offline', is_flag=True, help="Don't download missing vendor files.")
+def build(offline):
+    """Vendor, fingerprint and precompress the static files."""
+    static_folder = current_app.static_folder
+    fetch_vendor(static_folder, offline)
+
+    shutil.rmtree(os.path.join(static_folder, DIST), ignore_errors=True)
+    manifest = {}
+    for directory, dirnames, filenames in os.walk(static_folder):
+        dirnames[:] = [d for d in dirnames if d != DIST]
+        for filename in sorted(filenames):
+            name = os.path.relpath(os.path.join(directory, filename), static_folder)
+            name = name.replace(os.sep, '/')
+            manifest[name] = fingerprint(static_folder, name)
+    with open(os.path.join(static_folder, DIST, MANIFEST), 'w') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    click.echo(f'Built {len(manifest)} assets{"" if brotli else " (no brotli installed)"}')
+
+
+def load_manifest(app):
+    try:
+        with open(os.path.join(app.static_folder, DIST, MANIFEST)) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+
+def init_assets(app):
+    manifest = load_manifest(app)
+    app.extensions['asset_manifest'] = manifest
+
+    @app.template_global()
+    def asset_url(filename):
+        if filename in manifest:
+            return url_for('static', filename=f'{DIST}/{manifest[filename]}')
+        if filename in VENDOR and not os.path.exists(os.path.join(app.static_folder, filename)):
+            # Not built yet - fall back to the CDN
+            return VENDOR[filename][0]
+        return url_for('static', filename=filename)
+
+    @app.template_global()
+    def asset_integrity(filename):
+        return VENDOR[filename][1]
+
+    # Serve hashed files precompressed, with far-future caching
+    def static(filename):
+        if not filename.startswith(DIST + '/'):
+            return app.send_static_file(filename)
+        mimetype = guess_type(filename)[0]
+        folder = os.path.join(app.static_folder, DIST)
+        name = filename[len(DIST) + 1:]
+        encoding = None
+        for candidate, suffix in (('br', '.br'), ('gzip', '.gz')):
+            if (request.accept_encodings[candidate]
+                    and os.path.exists(os.path.join(folder, name + suffix))):
+                encoding, name = candidate, name + suffix
+                break
+        response = send_from_directory(folder, name, mimetype=mimetype, max_age=31536000)
+        if encoding:
+            response.content_encoding = encoding
+        response.vary.add('Accept-Encoding')
+        response.headers['Cache-Control'] = IMMUTABLE
+        return response
+
+    app.view_functions['static'] = static
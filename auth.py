@@ -0,0 +1,42 @@
+from flask import Blueprint, render_template, flash, redirect, url_for
+from flask_login import login_user, login_required, logout_user
+
+from extensions import db, hasher
+from models import Users
+from webforms import LoginForm
+
+bp = Blueprint('auth', __name__)
+
+# Create Login Page
+
+
+@bp.route('/login', methods=['GET', 'POST'])
+def login():
+    form = LoginForm()
+    if form.validate_on_submit():
+        user = Users.query.filter_by(username=form.username.data).first()
+        if user:
+            # Check the hash
+            if user.verify_password(form.password.data):
+                # Bring old hashes up to the current cost while we have the password
+                if hasher.needs_rehash(user.password_hash):
+                    user.password = form.password.data
+                    db.session.commit()
+                login_user(user)
+                flash('Login Successful!!')
+                return redirect(url_for('users.dashboard'))
+            else:
+                flash('Wrong Password - Try Again!')
+        else:
+            flash('User Doesn\'t Exist. Try Again.')
+    return render_template('login.html', form=form)
+
+# Create Logout Page
+
+
+@bp.route('/logout', methods=['GET', 'POST'])
+@login_required
+def logout():
+    logout_user()
+    flash('You Have Been Logged Out! Thanks for visiting!')
+    return redirect(url_for('auth.login'))
@@ -0,0 +1,228 @@
+"""Route benchmark
+
+Seeds a throwaway SQLite database, then drives the app's routes through the
+Flask test client with a mix of anonymous and logged in traffic. Reports
+p50/p95/p99 latency, throughput and SQL statements per request for each
+route, and compares them with a stored baseline.
+
+    python benchmarks/routes.py --users 200 --posts 5000 --requests 2000
+    python benchmarks/routes.py --save-baseline
+
+benchmarks/baseline.json is committed: a run with the default settings on
+the machine named in it. Latency only compares on similar hardware, so on
+another machine (or in CI) save a fresh baseline from the target branch
+first and compare the change against that; the query counts compare
+anywhere.
+"""
+import argparse
+import itertools
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from werkzeug.security import generate_password_hash  # noqa: E402
+
+from app import create_app  # noqa: E402
+from content import render_post  # noqa: E402
+from extensions import db  # noqa: E402
+from models import Users, Posts, search_index  # noqa: E402
+
+DEFAULT_BASELINE = os.path.join(ROOT, 'benchmarks', 'baseline.json')
+PASSWORD = 'benchmark'
+WORDS = ('flask python blog post database query index cache worker request template '
+         'render session login search page author title content slug engine pool').split()
+
+
+def seed(app, users, posts, iterations):
+    # One hash for everybody - we're measuring the app, not pbkdf2
+    password_hash = generate_password_hash(PASSWORD, f'pbkdf2:sha256:{iterations}')
+    rng = random.Random(1)
+    start = datetime(2020, 1, 1)
+    with app.app_context():
+        db.create_all()
+        db.session.bulk_insert_mappings(Users, [
+            {'id': i, 'username': f'user{i}', 'name': f'User {i}', 'email': f'user{i}@example.com',
+             'favorite_color': 'blue', 'about_author': 'About user %d' % i,
+             'password_hash': password_hash}
+            for i in range(1, users + 1)])
+        contents = ['<p>%s</p>' % ' '.join(rng.choices(WORDS, k=120)) for _ in range(posts)]
+        db.session.bulk_insert_mappings(Posts, [
+            dict({'id': i, 'title': ' '.join(rng.sample(WORDS, 4)).title(),
+                  'content': content, 'slug': f'post-{i}', 'poster_id': rng.randint(1, users),
+                  'date_posted': start + timedelta(minutes=i)},
+                 **render_post(content, app.config['POST_EXCERPT_LENGTH']))
+            for i, content in enumerate(contents, 1)])
+        db.session.commit()
+        search_index.rebuild()
+
+
+def login(app, user_id):
+    client = app.test_client()
+    client.post('/login', data={'username': f'user{user_id}', 'password': PASSWORD})
+    return client
+
+
+def scenarios(users, posts):
+    # (weight, route, logged in, method, path, form data)
+    counter = itertools.count(1)
+    rng = random.Random(2)
+
+    def new_user():
+        n = next(counter)
+        return {'username': f'new{n}', 'name': 'New', 'email': f'new{n}@example.com',
+                'favorite_color': 'red', 'password_hash': PASSWORD, 'password_hash2': PASSWORD}
+
+    return [
+        (30, '/posts', False, 'GET', lambda: '/posts', None),
+        (10, '/posts', True, 'GET', lambda: '/posts', None),
+        (25, '/posts/<slug>', False, 'GET', lambda: f'/posts/post-{rng.randint(1, posts)}', None),
+        (5, '/posts/<slug>', True, 'GET', lambda: f'/posts/post-{rng.randint(1, posts)}', None),
+        (10, '/search', False, 'POST', lambda: '/search',
+         lambda: {'searched': ' '.join(rng.sample(WORDS, 2))}),
+        (3, '/login', False, 'POST', lambda: '/login',
+         lambda: {'username': f'user{rng.randint(1, users)}', 'password': PASSWORD}),
+        (5, '/dashboard', True, 'GET', lambda: '/dashboard', None),
+        (4, '/user/add', False, 'GET', lambda: '/user/add', None),
+        (1, '/user/add', False, 'POST', lambda: '/user/add', new_user),
+        (2, '/add-post', True, 'GET', lambda: '/add-post', None),
+        (1, '/add-post', True, 'POST', lambda: '/add-post', lambda: {
+            'title': 'Benchmark post', 'content': '<p>%s</p>' % ' '.join(rng.choices(WORDS, k=80)),
+            'slug': 'benchmark-post'}),
+    ]
+
+
+def percentile(values, pct):
+    values = sorted(values)
+    index = min(len(values) - 1, max(0, round(pct / 100 * len(values)) - 1))
+    return values[index]
+
+
+def run(app, users, posts, requests, warmup, sessions):
+    rng = random.Random(3)
+    anonymous = app.test_client()
+    logged_in = [login(app, rng.randint(1, users)) for _ in range(sessions)]
+    mix = scenarios(users, posts)
+    weights = [weight for weight, *_ in mix]
+
+    timings = {}
+    queries = {}
+    statuses = {}
+    total_start = time.perf_counter()
+    for i in range(warmup + requests):
+        _, route, authed, method, path, data = rng.choices(mix, weights)[0]
+        client = rng.choice(logged_in) if authed else anonymous
+        key = f'{method} {route} ({"user" if authed else "anon"})'
+        start = time.perf_counter()
+        response = client.open(path(), method=method, data=data() if data else None)
+        elapsed = (time.perf_counter() - start) * 1000
+        if i == warmup:
+            total_start = start
+        if i < warmup:
+            continue
+        timings.setdefault(key, []).append(elapsed)
+        queries.setdefault(key, []).append(int(response.headers.get('X-Query-Count', 0)))
+        statuses.setdefault(key, {}).setdefault(response.status_code, 0)
+        statuses[key][response.status_code] += 1
+    total = time.perf_counter() - total_start
+
+    routes = {}
+    for key, values in sorted(timings.items()):
+        routes[key] = {
+            'requests': len(values),
+            'p50_ms': percentile(values, 50),
+            'p95_ms': percentile(values, 95),
+            'p99_ms': percentile(values, 99),
+            'queries_per_request': statistics.mean(queries[key]),
+            'max_queries': max(queries[key]),
+            'statuses': {str(code): count for code, count in statuses[key].items()},
+        }
+    return {'requests': requests, 'seconds': total, 'throughput_rps': requests / total,
+            'routes': routes}
+
+
+def compare(result, baseline, max_regression):
+    # Returns the routes that got slower (p95) or run more queries
+    regressions = []
+    print(f'\n{"route":<34} {"p95 ms":>9} {"base":>9} {"change":>8} {"queries":>8} {"base":>6}')
+    for key, stats in result['routes'].items():
+        old = baseline.get('routes', {}).get(key)
+        if old is None:
+            print(f'{key:<34} {stats["p95_ms"]:9.2f} {"-":>9} {"new":>8} '
+                  f'{stats["queries_per_request"]:8.2f} {"-":>6}')
+            continue
+        change = (stats['p95_ms'] - old['p95_ms']) / old['p95_ms'] * 100 if old['p95_ms'] else 0
+        print(f'{key:<34} {stats["p95_ms"]:9.2f} {old["p95_ms"]:9.2f} {change:+7.1f}% '
+              f'{stats["queries_per_request"]:8.2f} {old["queries_per_request"]:6.2f}')
+        if change > max_regression or stats['max_queries'] > old['max_queries']:
+            regressions.append(key)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--users', type=int, default=100)
+    parser.add_argument('--posts', type=int, default=2000)
+    parser.add_argument('--requests', type=int, default=1000)
+    parser.add_argument('--warmup', type=int, default=100)
+    parser.add_argument('--sessions', type=int, default=10, help='logged in clients')
+    parser.add_argument('--hash-iterations', type=int, default=1000,
+                        help='pbkdf2 iterations for seeded and new passwords')
+    parser.add_argument('--output', help='write the results to this JSON file')
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE)
+    parser.add_argument('--save-baseline', action='store_true')
+    parser.add_argument('--max-regression', type=float, default=20.0,
+                        help='allowed p95 slowdown, in percent')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        app = create_app({
+            'SQLALCHEMY_DATABASE_URI': 'sqlite:///' + os.path.join(tmp, 'bench.db'),
+            'SECRET_KEY': 'benchmark',
+            'WTF_CSRF_ENABLED': False,
+            'PASSWORD_HASH_WORKERS': 0,
+            'PASSWORD_HASH_ITERATIONS': args.hash_iterations,
+            # One client sends everything - don't throttle it
+            'RATE_LIMITS': '',
+        })
+        seed(app, args.users, args.posts, args.hash_iterations)
+        result = run(app, args.users, args.posts, args.requests, args.warmup, args.sessions)
+    result['config'] = {'users': args.users, 'posts': args.posts, 'requests': args.requests}
+    result['machine'] = {'python': platform.python_version(), 'platform': platform.platform(),
+                         'cpus': os.cpu_count()}
+
+    print(f'{args.requests} requests in {result["seconds"]:.2f}s '
+          f'({result["throughput_rps"]:.1f} req/s)')
+    for key, stats in result['routes'].items():
+        print(f'{key:<34} n={stats["requests"]:<5} p50 {stats["p50_ms"]:7.2f}  '
+              f'p95 {stats["p95_ms"]:7.2f}  p99 {stats["p99_ms"]:7.2f}  '
+              f'sql {stats["queries_per_request"]:.1f}')
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(result, f, indent=2)
+    if args.save_baseline:
+        with open(args.baseline, 'w') as f:
+            json.dump(result, f, indent=2)
+        print(f'Saved baseline to {args.baseline}')
+    elif os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        if baseline.get('config') != result['config']:
+            print(f'\nBaseline was run with {baseline.get("config")} - numbers may not compare')
+        regressions = compare(result, baseline, args.max_regression)
+        if regressions:
+            print('\nRegressions: ' + ', '.join(regressions))
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,84 @@
+"""Cold start benchmark
+
+Starts a fresh interpreter for every run (like a new gunicorn worker) and
+reports how long it takes to import the app, build it with create_app()
+and answer the first request.
+
+    python benchmarks/startup.py --runs 10 --path /posts
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Everything the app writes goes to an in-memory database or a throwaway
+# directory (argv[2]); the tables are created outside the timings
+CHILD = '''
+import json, os, sys, time
+start = time.perf_counter()
+from app import create_app
+imported = time.perf_counter()
+tmp = sys.argv[2]
+app = create_app({
+    "SQLALCHEMY_DATABASE_URI": "sqlite://",
+    "SECRET_KEY": "benchmark",
+    "PASSWORD_HASH_WORKERS": 0,
+    "RATE_LIMIT_PATH": os.path.join(tmp, "ratelimit.db"),
+    "METRICS_PATH": os.path.join(tmp, "metrics.db"),
+    "PAGE_CACHE_PATH": os.path.join(tmp, "pages.db"),
+    "FRAGMENT_CACHE_PATH": os.path.join(tmp, "fragments.db"),
+})
+created = time.perf_counter()
+from extensions import db
+with app.app_context():
+    db.create_all()
+created_tables = time.perf_counter()
+response = app.test_client().get(sys.argv[1])
+responded = time.perf_counter()
+print(json.dumps({
+    "import_ms": (imported - start) * 1000,
+    "create_app_ms": (created - imported) * 1000,
+    "first_request_ms": (responded - created_tables) * 1000,
+    "total_ms": (responded - created_tables + created - start) * 1000,
+    "status": response.status_code,
+}))
+'''
+
+
+def run_once(path):
+    with tempfile.TemporaryDirectory() as tmp:
+        output = subprocess.run([sys.executable, '-c', CHILD, path, tmp], cwd=ROOT,
+                                check=True, capture_output=True, text=True).stdout
+    run = json.loads(output.strip().splitlines()[-1])
+    # An error page is not a first request worth timing
+    if run['status'] != 200:
+        sys.exit(f'{path} answered {run["status"]}, not 200')
+    return run
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--path', default='/')
+    parser.add_argument('--output', help='write the results to this JSON file')
+    args = parser.parse_args()
+
+    runs = [run_once(args.path) for _ in range(args.runs)]
+    summary = {}
+    for key in ('import_ms', 'create_app_ms', 'first_request_ms', 'total_ms'):
+        values = [run[key] for run in runs]
+        summary[key] = {'median': statistics.median(values), 'max': max(values)}
+        print(f'{key:<18} median {summary[key]["median"]:8.1f}  max {summary[key]["max"]:8.1f}')
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'path': args.path, 'runs': runs, 'summary': summary}, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,234 @@
+from flask import Blueprint, abort, current_app, render_template, flash, request, redirect, url_for
+from flask_login import login_required, current_user
+from markupsafe import Markup
+from sqlalchemy import func, select
+from sqlalchemy.exc import IntegrityError
+
+from conditional import page_etag, conditional_response
+from extensions import db, get_cache
+from jobs import job, enqueue
+from models import Users, Posts, search_index, unique_slug
+from pagecache import purge_pages
+from pagination import keyset_paginate
+from replicas import use_replica
+from webforms import PostForm, SearchForm
+
+bp = Blueprint('blog', __name__)
+
+# Tries at a free slug when other saves keep taking the one we picked
+SLUG_ATTEMPTS = 3
+
+
+# Listings show the excerpt, so leave the full content in the database
+# and load each post's author in the same query instead of one SELECT per row
+def listing_options():
+    return [db.joinedload(Posts.poster), db.defer(Posts.content), db.defer(Posts.content_html)]
+
+
+# Get one page of blog posts, oldest first
+def get_posts_page(after=None, before=None):
+    query = Posts.query.options(*listing_options())
+    return keyset_paginate(query, Posts.date_posted, Posts.id,
+                           current_app.config['POSTS_PER_PAGE'], after=after, before=before)
+
+
+# One cheap query that changes whenever any listed post (or its author) does
+def get_posts_stamp():
+    users_modified = select(func.max(Users.date_modified)).scalar_subquery()
+    return db.session.execute(select(func.count(Posts.id), func.max(Posts.date_modified),
+                                     users_modified)).one()
+
+
+# Rendered post markup, keyed by post and author versions so an edit
+# (or a profile change) simply moves on to a new key
+@bp.app_template_global()
+def post_fragment(post, variant):
+    fragment_cache = get_cache('fragment')
+    poster_version = post.poster.version if post.poster else 0
+    key = f'post:{post.id}:{variant}:{post.version}:{poster_version}'
+    html = fragment_cache.get(key)
+    if html is None:
+        # Render without the context processors, the fragment doesn't need them
+        template = current_app.jinja_env.get_template(f'fragments/post_{variant}.html')
+        html = template.render(post=post)
+        fragment_cache.set(key, html)
+    return Markup(html)
+
+
+# Two saves can pick the same free slug at once. The unique index turns
+# the second one away, and it runs `save(slug)` again with the next one.
+def commit_with_slug(save, text, post_id=None):
+    for attempt in range(SLUG_ATTEMPTS):
+        try:
+            post = save(unique_slug(text, post_id=post_id))
+            db.session.commit()
+            return post
+        except IntegrityError:
+            db.session.rollback()
+            if attempt == SLUG_ATTEMPTS - 1:
+                raise
+
+
+# Search indexing runs after the response, see jobs.py
+@job('index_post')
+def index_post(post_id):
+    post = db.session.get(Posts, post_id)
+    # Deleted before we got to it
+    if post is not None:
+        search_index.index_post(post)
+        db.session.commit()
+
+
+# Add Post Page
+@bp.route('/add-post', methods=['GET', 'POST'])
+@login_required
+def add_post():
+    form = PostForm()
+
+    if form.validate_on_submit():
+        poster = current_user.id
+
+        def save(slug):
+            post = Posts(title=form.title.data, content=form.content.data, poster_id=poster,
+                         slug=slug)
+            post.render_content(current_app.config['POST_EXCERPT_LENGTH'])
+            db.session.add(post)
+            db.session.flush()
+            enqueue('index_post', post_id=post.id)
+            return post
+
+        commit_with_slug(save, form.slug.data or form.title.data)
+        purge_pages('/posts')
+        form.title.data = ''
+        form.content.data = ''
+        form.slug.data = ''
+
+        flash('blog Post Submitted Successfully')
+
+    return render_template('add_post.html', form=form)
+
+
+@bp.route('/posts')
+@use_replica
+def posts():
+    after = request.args.get('after')
+    before = request.args.get('before')
+    count, posts_modified, users_modified = get_posts_stamp()
+    etag = page_etag('posts', after, before, count, posts_modified, users_modified)
+    last_modified = max(filter(None, [posts_modified, users_modified]), default=None)
+
+    def render():
+        posts = get_posts_page(after=after, before=before)
+        return render_template('posts.html', posts=posts)
+
+    return conditional_response(etag, render, last_modified)
+
+
+# Slug -> post id, so most post pages load the post by primary key
+def post_id_for_slug(slug):
+    slug_cache = get_cache('slug')
+    post_id = slug_cache.get(slug)
+    if post_id is None:
+        post_id = db.session.query(Posts.id).filter_by(slug=slug).scalar()
+        if post_id is None:
+            abort(404)
+        slug_cache.set(slug, post_id)
+    return post_id
+
+
+# Old links: /posts/<id> moves permanently to /posts/<slug>
+@bp.route('/posts/<int:id>')
+def post_by_id(id):
+    slug = db.session.query(Posts.slug).filter_by(id=id).scalar()
+    if slug is None:
+        abort(404)
+    return redirect(url_for('blog.post', slug=slug), code=301)
+
+
+@bp.route('/posts/<slug>')
+@use_replica
+def post(slug):
+    post = db.session.get(Posts, post_id_for_slug(slug), options=[db.joinedload(Posts.poster)])
+    if post is None or post.slug != slug:
+        # Another worker renamed or deleted it after we cached the slug
+        get_cache('slug').delete(slug)
+        post = (Posts.query.options(db.joinedload(Posts.poster))
+                .filter_by(slug=slug).first_or_404())
+    poster_version = post.poster.version if post.poster else 0
+    etag = page_etag('post', post.id, post.version, poster_version)
+    return conditional_response(etag, lambda: render_template('post.html', post=post),
+                                post.date_modified)
+
+
+@bp.route('/posts/edit/<int:id>', methods=['GET', 'POST'])
+@login_required
+def edit_post(id):
+    post = Posts.query.get_or_404(id)
+    form = PostForm()
+    if form.validate_on_submit():
+        old_slug = post.slug
+
+        def save(slug):
+            # After a rollback post is reloaded, so this starts over cleanly
+            post.title = form.title.data
+            post.slug = slug
+            post.content = form.content.data
+            post.render_content(current_app.config['POST_EXCERPT_LENGTH'])
+            post.version += 1
+            db.session.add(post)
+            enqueue('index_post', post_id=post.id)
+            return post
+
+        commit_with_slug(save, form.slug.data or form.title.data, post_id=post.id)
+        get_cache('slug').delete(old_slug)
+        purge_pages('/posts')
+        flash('Post Has Been Updated')
+
+        return redirect(url_for('blog.post', slug=post.slug))
+
+    if current_user.id == post.poster_id:
+        form.title.data = post.title
+        form.slug.data = post.slug
+        form.content.data = post.content
+        return render_template('edit_post.html', form=form)
+    else:
+        flash("You aren't authorized to dit this post ")
+        posts = get_posts_page()
+        return render_template('posts.html', posts=posts)
+
+
+@bp.route('/posts/delete/<int:id>')
+@login_required
+def delete_post(id):
+    id = current_user.id
+    post_to_delete = Posts.query.get_or_404(id)
+    if id == post_to_delete.id:
+        slug = post_to_delete.slug
+        try:
+            search_index.remove_post(post_to_delete.id)
+            db.session.delete(post_to_delete)
+            db.session.commit()
+            get_cache('fragment').delete_prefix(f'post:{id}:')
+            get_cache('slug').delete(slug)
+            purge_pages('/posts')
+            flash('Blog Post Was Deleted')
+        except:
+            flash("Whoops! Problem Deleting Post")
+        finally:
+            posts = get_posts_page()
+            return render_template('posts.html', posts=posts)
+    else:
+        flash("You aren't authorized to delete the post")
+        posts = get_posts_page()
+        return render_template('posts.html', posts=posts)
+
+
+@bp.route('/search', methods=['POST'])
+@use_replica
+def search():
+    form = SearchForm()
+    if form.validate_on_submit():
+        searched = form.searched.data
+        # Ranked, every word must match
+        posts = search_index.search(searched, options=listing_options())
+        return render_template("search.html", form=form, searched=searched, posts=posts)
@@ -0,0 +1,128 @@
+import zlib
+from werkzeug.datastructures import Headers
+from werkzeug.http import parse_accept_header
+
+try:
+    import brotli
+except ImportError:  # optional - without it we only do gzip
+    brotli = None
+
+# Response compression
+#
+# WSGI middleware that gzips (or brotlis) responses chunk by chunk as the
+# app produces them, so streamed responses like the NDJSON export go out
+# compressed without ever being held in memory whole.
+
+# Already compressed, or not worth it
+SKIP_TYPES = ('image/', 'video/', 'audio/', 'font/', 'application/zip', 'application/gzip',
+              'application/x-gzip', 'application/pdf', 'application/octet-stream')
+SKIP_STATUS = (204, 206, 304)
+
+
+class GzipEncoder:
+    name = 'gzip'
+
+    def __init__(self, level):
+        # wbits 31 = gzip header and trailer
+        self._zlib = zlib.compressobj(level, zlib.DEFLATED, 31)
+
+    def compress(self, data, flush):
+        out = self._zlib.compress(data)
+        if flush:
+            out += self._zlib.flush(zlib.Z_SYNC_FLUSH)
+        return out
+
+    def finish(self):
+        return self._zlib.flush()
+
+
+class BrotliEncoder:
+    name = 'br'
+
+    def __init__(self, quality):
+        self._brotli = brotli.Compressor(quality=quality)
+
+    def compress(self, data, flush):
+        out = self._brotli.process(data)
+        if flush:
+            out += self._brotli.flush()
+        return out
+
+    def finish(self):
+        return self._brotli.finish()
+
+
+class CompressionMiddleware:
+    def __init__(self, app, level=6, brotli_quality=4, min_size=500, skip_types=SKIP_TYPES):
+        self.app = app
+        self.level = level
+        self.brotli_quality = brotli_quality
+        self.min_size = min_size
+        self.skip_types = tuple(skip_types)
+
+    def choose_encoder(self, environ):
+        # Same answer for HEAD as for GET, so the headers match
+        accepted = parse_accept_header(environ.get('HTTP_ACCEPT_ENCODING'))
+        if brotli is not None and accepted['br']:
+            return lambda: BrotliEncoder(self.brotli_quality)
+        if accepted['gzip']:
+            return lambda: GzipEncoder(self.level)
+        return None
+
+    def compressible(self, headers):
+        # Whether this kind of response gets compressed for clients that ask
+        if 'Content-Encoding' in headers:
+            return False
+        if 'no-transform' in headers.get('Cache-Control', ''):
+            return False
+        return not headers.get('Content-Type', '').startswith(self.skip_types)
+
+    def should_compress(self, status, headers):
+        if int(status.split(' ', 1)[0]) in SKIP_STATUS or not self.compressible(headers):
+            return False
+        length = headers.get('Content-Length')
+        # Unknown length means a stream - always worth compressing
+        return length is None or int(length) >= self.min_size
+
+    def __call__(self, environ, start_response):
+        make_encoder = self.choose_encoder(environ)
+        state = {'encoder': None, 'stream': False}
+
+        def compressing_start_response(status, headers, exc_info=None):
+            headers = Headers(headers)
+            if self.compressible(headers):
+                # Small or not, this URL can come back compressed for
+                # someone else, so caches must key on Accept-Encoding
+                vary = headers.get('Vary')
+                if not vary:
+                    headers['Vary'] = 'Accept-Encoding'
+                elif 'accept-encoding' not in vary.lower():
+                    headers['Vary'] = vary + ', Accept-Encoding'
+            if make_encoder is not None and self.should_compress(status, headers):
+                state['encoder'] = make_encoder()
+                state['stream'] = 'Content-Length' not in headers
+                headers['Content-Encoding'] = state['encoder'].name
+                headers.remove('Content-Length')
+                # Different bytes now, so a strong validator would be wrong
+                etag = headers.get('ETag')
+                if etag and not etag.startswith('W/'):
+                    headers['ETag'] = 'W/' + etag
+            return start_response(status, headers.to_wsgi_list(), exc_info)
+
+        app_iter = self.app(environ, compressing_start_response)
+        # A HEAD response has the headers of the compressed one but no body
+        if state['encoder'] is None or environ.get('REQUEST_METHOD') == 'HEAD':
+            return app_iter
+        return self.compress(app_iter, state['encoder'], state['stream'])
+
+    def compress(self, app_iter, encoder, stream):
+        try:
+            for chunk in app_iter:
+                # Flush each chunk of a stream so the client gets it now
+                data = encoder.compress(chunk, flush=stream)
+                if data:
+                    yield data
+            yield encoder.finish()
+        finally:
+            if hasattr(app_iter, 'close'):
+                app_iter.close()
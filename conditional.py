@@ -0,0 +1,58 @@
+import hashlib
+import time
+from flask import current_app, g, make_response, request, session
+from flask_login import current_user
+
+
+# Conditional GET
+#
+# Pages get an ETag built from the version stamps of what they show. A
+# client that sends it back in If-None-Match gets a 304 before we render
+# anything.
+#
+# The HTML also depends on who is asking (edit buttons, navbar) and embeds
+# a CSRF token that is only valid for WTF_CSRF_TIME_LIMIT seconds, so both
+# are part of the tag. That makes it a weak ETag (same page, not the same
+# bytes) and the response private.
+
+
+def page_etag(*parts):
+    stamp = '|'.join(str(part) for part in parts)
+    # Kept with the page if the page cache stores it, see pagecache.py
+    g.page_stamp = stamp
+    return stamp_etag(stamp)
+
+
+def stamp_etag(stamp):
+    # The ETag for this visitor of a page with this stamp
+    user_id = current_user.get_id() if current_user.is_authenticated else 'anon'
+    csrf = session.get('csrf_token', '')
+    time_limit = current_app.config.get('WTF_CSRF_TIME_LIMIT') or 3600
+    # A page is never reused for more than half the token's lifetime
+    token_window = int(time.time() // (time_limit / 2))
+    raw = '|'.join(str(part) for part in (stamp, user_id, csrf, token_window))
+    return hashlib.sha1(raw.encode()).hexdigest()
+
+
+def is_not_modified(etag):
+    # Flashed messages are shown once, so those pages always render
+    if session.get('_flashes'):
+        return False
+    return request.if_none_match.contains_weak(etag)
+
+
+def conditional_response(etag, render, last_modified=None):
+    if is_not_modified(etag):
+        response = make_response('', 304)
+    else:
+        response = make_response(render())
+        # The render may have just given a new visitor their CSRF token,
+        # so tag the page with the session it leaves behind
+        if 'page_stamp' in g:
+            etag = stamp_etag(g.page_stamp)
+    response.set_etag(etag, weak=True)
+    if last_modified is not None:
+        response.last_modified = last_modified
+    response.cache_control.private = True
+    response.cache_control.no_cache = True
+    return response
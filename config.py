@@ -0,0 +1,88 @@
+import os
+from dotenv import load_dotenv
+
+load_dotenv()
+
+
+class Config:
+    # Add Database
+    SQLALCHEMY_DATABASE_URI = os.getenv('SQLALCHEMY_DATABASE_URI')
+    # Secret Key!
+    SECRET_KEY = os.getenv('SECRET_KEY')
+    # Blog posts shown per page
+    POSTS_PER_PAGE = int(os.getenv('POSTS_PER_PAGE', 25))
+    # Characters of plain text shown for each post in listings
+    POST_EXCERPT_LENGTH = int(os.getenv('POST_EXCERPT_LENGTH', 300))
+    # Max SQL statements per request before we complain (0 = no limit)
+    SQL_QUERY_BUDGET = int(os.getenv('SQL_QUERY_BUDGET', 0))
+    # Rendered post fragments kept per worker, plus an optional file shared by all workers
+    FRAGMENT_CACHE_SIZE = int(os.getenv('FRAGMENT_CACHE_SIZE', 1000))
+    FRAGMENT_CACHE_PATH = os.getenv('FRAGMENT_CACHE_PATH')
+    # Whole pages for anonymous visitors, in a file shared by all workers (off
+    # unless a path is set): seconds fresh, seconds more a stale copy may be
+    # served while one worker renders a new one, and the most it may hold
+    PAGE_CACHE_PATH = os.getenv('PAGE_CACHE_PATH')
+    PAGE_CACHE_TTL = int(os.getenv('PAGE_CACHE_TTL', 60))
+    PAGE_CACHE_STALE = int(os.getenv('PAGE_CACHE_STALE', 300))
+    PAGE_CACHE_MAX_BYTES = int(os.getenv('PAGE_CACHE_MAX_BYTES', 64 * 1024 * 1024))
+    # Logged in users kept per worker, and for how many seconds
+    USER_CACHE_SIZE = int(os.getenv('USER_CACHE_SIZE', 1000))
+    USER_CACHE_TTL = int(os.getenv('USER_CACHE_TTL', 60))
+    # Post slug -> id lookups kept per worker, and for how many seconds
+    SLUG_CACHE_SIZE = int(os.getenv('SLUG_CACHE_SIZE', 10000))
+    SLUG_CACHE_TTL = int(os.getenv('SLUG_CACHE_TTL', 300))
+    # Password hashing: worker processes (0 = hash in the request), how many hashes
+    # may wait for them, and how long one hash should take on this machine
+    PASSWORD_HASH_WORKERS = int(os.getenv('PASSWORD_HASH_WORKERS', 2))
+    PASSWORD_HASH_MAX_PENDING = int(os.getenv('PASSWORD_HASH_MAX_PENDING', 64))
+    PASSWORD_HASH_TARGET_MS = int(os.getenv('PASSWORD_HASH_TARGET_MS', 250))
+    # Set to pin the iteration count for every worker instead of calibrating
+    # each one to PASSWORD_HASH_TARGET_MS (0 = calibrate), and how many
+    # seconds a login may wait for a free hashing slot
+    PASSWORD_HASH_ITERATIONS = int(os.getenv('PASSWORD_HASH_ITERATIONS', 0))
+    PASSWORD_HASH_TIMEOUT = float(os.getenv('PASSWORD_HASH_TIMEOUT', 5))
+    # Send per-request timings back in a Server-Timing header
+    SERVER_TIMING = os.getenv('SERVER_TIMING', 'false').lower() in ('1', 'true', 'yes')
+    # Log requests slower than this many milliseconds (0 = never), and
+    # optionally sample their stacks every SLOW_REQUEST_PROFILE_INTERVAL_MS
+    SLOW_REQUEST_MS = int(os.getenv('SLOW_REQUEST_MS', 1000))
+    SLOW_REQUEST_PROFILE = os.getenv('SLOW_REQUEST_PROFILE', 'false').lower() in ('1', 'true', 'yes')
+    SLOW_REQUEST_PROFILE_INTERVAL_MS = int(os.getenv('SLOW_REQUEST_PROFILE_INTERVAL_MS', 5))
+    # Response compression: gzip level (1-9), brotli quality (0-11, if the
+    # brotli package is installed) and the smallest body worth compressing
+    COMPRESS_ENABLED = os.getenv('COMPRESS_ENABLED', 'true').lower() in ('1', 'true', 'yes')
+    COMPRESS_LEVEL = int(os.getenv('COMPRESS_LEVEL', 6))
+    COMPRESS_BR_QUALITY = int(os.getenv('COMPRESS_BR_QUALITY', 4))
+    COMPRESS_MIN_SIZE = int(os.getenv('COMPRESS_MIN_SIZE', 500))
+    # Metrics file shared by the workers on this node (default: instance/metrics.db),
+    # how often (seconds) each worker adds its numbers to it, and a bearer
+    # token that lets a Prometheus scraper in without an admin login
+    METRICS_PATH = os.getenv('METRICS_PATH')
+    METRICS_FLUSH_INTERVAL = float(os.getenv('METRICS_FLUSH_INTERVAL', 1))
+    METRICS_TOKEN = os.getenv('METRICS_TOKEN')
+    # Form submits allowed per client IP / username (see ratelimit.py; empty
+    # turns it off), kept in a file shared by the workers (default: instance/ratelimit.db)
+    RATE_LIMITS = os.getenv('RATE_LIMITS', 'auth.login=ip:20/60,username:10/60;'
+                                           'blog.search=ip:30/60;users.add_user=ip:5/60')
+    RATE_LIMIT_PATH = os.getenv('RATE_LIMIT_PATH')
+    # Background jobs: run them in the web process after the request instead
+    # of queueing (turn off wherever `flask worker` runs), tries before giving
+    # up, first retry delay in seconds (doubling after that) and threads per
+    # worker process
+    JOBS_INLINE = os.getenv('JOBS_INLINE', 'true').lower() in ('1', 'true', 'yes')
+    JOBS_MAX_ATTEMPTS = int(os.getenv('JOBS_MAX_ATTEMPTS', 5))
+    JOBS_RETRY_SECONDS = int(os.getenv('JOBS_RETRY_SECONDS', 10))
+    JOBS_WORKER_THREADS = int(os.getenv('JOBS_WORKER_THREADS', 4))
+    # Read replicas (comma separated URIs, none by default) and how long a
+    # client reads from the primary after it writes something
+    REPLICA_URIS = [uri.strip() for uri in os.getenv('REPLICA_URIS', '').split(',') if uri.strip()]
+    REPLICA_PIN_SECONDS = float(os.getenv('REPLICA_PIN_SECONDS', 5))
+    # Requests each ASGI worker (asgi.py) runs at once, one thread each
+    ASGI_THREADS = int(os.getenv('ASGI_THREADS', 16))
+    # Database connection pool (per worker). Recycle connections before the
+    # server's wait_timeout and check each one before handing it out.
+    DB_POOL_SIZE = int(os.getenv('DB_POOL_SIZE', 5))
+    DB_MAX_OVERFLOW = int(os.getenv('DB_MAX_OVERFLOW', 10))
+    DB_POOL_RECYCLE = int(os.getenv('DB_POOL_RECYCLE', 1800))
+    DB_POOL_TIMEOUT = int(os.getenv('DB_POOL_TIMEOUT', 10))
+    DB_POOL_PRE_PING = os.getenv('DB_POOL_PRE_PING', 'true').lower() in ('1', 'true', 'yes')
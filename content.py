@@ -0,0 +1,150 @@
+import math
+import re
+import unicodedata
+from html import escape
+from html.parser import HTMLParser
+from urllib.parse import urlsplit
+
+
+# Post content
+#
+# CKEditor hands us HTML, stored as-is in posts.content so it can be
+# edited again. Each time a post is saved we also work out what pages
+# show: the HTML cut down to a safe set of tags, a plain text excerpt for
+# listings, and the word count and reading time.
+
+# Tag: attributes it may keep
+ALLOWED_TAGS = {
+    'a': {'href', 'title'},
+    'img': {'src', 'alt', 'title', 'width', 'height'},
+    'td': {'colspan', 'rowspan'},
+    'th': {'colspan', 'rowspan'},
+    **{tag: set() for tag in (
+        'p', 'br', 'hr', 'div', 'span', 'strong', 'b', 'em', 'i', 'u', 's', 'strike',
+        'sub', 'sup', 'blockquote', 'pre', 'code', 'ul', 'ol', 'li',
+        'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'table', 'thead', 'tbody', 'tfoot', 'tr',
+        'caption', 'figure', 'figcaption')},
+}
+VOID_TAGS = {'br', 'hr', 'img'}
+# Dropped along with everything inside them
+DROP_TAGS = {'script', 'style', 'iframe', 'object', 'embed', 'template', 'noscript'}
+URL_ATTRIBUTES = {'href', 'src'}
+URL_SCHEMES = {'', 'http', 'https', 'mailto'}
+# Text of these ends a "line", for the excerpt
+BLOCK_TAGS = {'p', 'br', 'div', 'li', 'blockquote', 'pre', 'tr', 'h1', 'h2', 'h3', 'h4',
+              'h5', 'h6'}
+
+WORDS_PER_MINUTE = 200
+WORD_RE = re.compile(r'\w+', re.UNICODE)
+SLUG_RE = re.compile(r'[^a-z0-9]+')
+# Leaves room for a "-2" on the end in the 255 character column
+MAX_SLUG_LENGTH = 200
+
+
+def safe_url(url):
+    try:
+        scheme = urlsplit(url.strip()).scheme
+    except ValueError:
+        # Malformed, e.g. "http://[::1"
+        return False
+    return scheme.lower() in URL_SCHEMES
+
+
+class _Sanitizer(HTMLParser):
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.html = []
+        self.text = []
+        self.open_tags = []
+        self.dropping = 0
+
+    def handle_starttag(self, tag, attrs):
+        if tag in DROP_TAGS:
+            self.dropping += 1
+            return
+        if self.dropping:
+            return
+        if tag in BLOCK_TAGS:
+            self.text.append(' ')
+        if tag not in ALLOWED_TAGS:
+            return
+        kept = ''
+        for name, value in attrs:
+            if name not in ALLOWED_TAGS[tag] or value is None:
+                continue
+            if name in URL_ATTRIBUTES and not safe_url(value):
+                continue
+            kept += f' {name}="{escape(value)}"'
+        if tag == 'a':
+            kept += ' rel="nofollow noopener"'
+        self.html.append(f'<{tag}{kept}>')
+        if tag not in VOID_TAGS:
+            self.open_tags.append(tag)
+
+    def handle_startendtag(self, tag, attrs):
+        self.handle_starttag(tag, attrs)
+        if tag not in VOID_TAGS:
+            self.handle_endtag(tag)
+
+    def handle_endtag(self, tag):
+        if tag in DROP_TAGS:
+            self.dropping = max(0, self.dropping - 1)
+            return
+        if self.dropping or tag not in self.open_tags:
+            return
+        # Close anything left open inside it too
+        while self.open_tags:
+            open_tag = self.open_tags.pop()
+            self.html.append(f'</{open_tag}>')
+            if open_tag == tag:
+                break
+
+    def handle_data(self, data):
+        if self.dropping:
+            return
+        self.html.append(escape(data, quote=False))
+        self.text.append(data)
+
+    def close(self):
+        super().close()
+        while self.open_tags:
+            self.html.append(f'</{self.open_tags.pop()}>')
+
+
+def sanitize(html):
+    # Returns (safe html, plain text)
+    sanitizer = _Sanitizer()
+    sanitizer.feed(html or '')
+    sanitizer.close()
+    text = ' '.join(''.join(sanitizer.text).split())
+    return ''.join(sanitizer.html), text
+
+
+def make_excerpt(text, length):
+    if len(text) <= length:
+        return text
+    # Cut at the last whole word that fits
+    cut = text[:length + 1]
+    cut = cut.rsplit(' ', 1)[0] if ' ' in cut else text[:length]
+    return cut.rstrip(' .,;:') + '…'
+
+
+def render_post(content, excerpt_length):
+    # The columns stored next to posts.content
+    html, text = sanitize(content)
+    word_count = len(WORD_RE.findall(text))
+    return {
+        'content_html': html,
+        'excerpt': make_excerpt(text, excerpt_length),
+        'word_count': word_count,
+        'reading_minutes': max(1, math.ceil(word_count / WORDS_PER_MINUTE)),
+    }
+
+
+def slugify(text):
+    # "Héllo, World!" -> "hello-world". Never all digits, those URLs are post ids.
+    text = unicodedata.normalize('NFKD', text or '').encode('ascii', 'ignore').decode()
+    slug = SLUG_RE.sub('-', text.lower()).strip('-')[:MAX_SLUG_LENGTH].rstrip('-')
+    if not slug or slug.isdigit():
+        slug = f'post-{slug}' if slug else 'post'
+    return slug
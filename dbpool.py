@@ -0,0 +1,125 @@
+import threading
+import time
+from bisect import bisect_left
+from sqlalchemy import event
+from sqlalchemy.pool import QueuePool
+
+
+# Database connection pool
+#
+# Pool settings come from the DB_POOL_* config values, and the pool keeps
+# a few numbers about itself (per worker) for the admin pool page.
+
+# Histogram bucket upper bounds, in milliseconds
+BUCKETS_MS = [1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000]
+
+
+class Histogram:
+    def __init__(self, buckets=BUCKETS_MS):
+        self.buckets = list(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.total = 0.0
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        with self._lock:
+            self.counts[bisect_left(self.buckets, value)] += 1
+            self.total += value
+            self.count += 1
+
+    def to_dict(self):
+        labels = [f'<={bound}' for bound in self.buckets] + [f'>{self.buckets[-1]}']
+        return {
+            'count': self.count,
+            'avg': self.total / self.count if self.count else 0,
+            'buckets': dict(zip(labels, self.counts)),
+        }
+
+
+class PoolStats:
+    def __init__(self):
+        self.wait_ms = Histogram()
+        self.connect_ms = Histogram()
+        self.checkouts = 0
+        self.connects = 0
+        self.invalidated = 0
+
+
+class TimedQueuePool(QueuePool):
+    # QueuePool that records how long each checkout waited for a connection
+
+    stats = None
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            if self.stats is not None:
+                self.stats.wait_ms.observe((time.perf_counter() - start) * 1000)
+
+    def recreate(self):
+        pool = super().recreate()
+        pool.stats = self.stats
+        return pool
+
+
+def engine_options(config):
+    uri = config.get('SQLALCHEMY_DATABASE_URI') or ''
+    options = dict(config.get('SQLALCHEMY_ENGINE_OPTIONS') or {})
+    # Throw away connections the server (or a firewall) may have dropped
+    options.setdefault('pool_pre_ping', config['DB_POOL_PRE_PING'])
+    if uri.startswith('sqlite'):
+        # SQLite doesn't use a QueuePool, the sizes don't apply
+        return options
+    options.setdefault('poolclass', TimedQueuePool)
+    options.setdefault('pool_size', config['DB_POOL_SIZE'])
+    options.setdefault('max_overflow', config['DB_MAX_OVERFLOW'])
+    options.setdefault('pool_recycle', config['DB_POOL_RECYCLE'])
+    options.setdefault('pool_timeout', config['DB_POOL_TIMEOUT'])
+    return options
+
+
+def init_pool_stats(engine):
+    stats = PoolStats()
+    if isinstance(engine.pool, TimedQueuePool):
+        engine.pool.stats = stats
+
+    # Open the DBAPI connection ourselves so we can time it
+    @event.listens_for(engine, 'do_connect')
+    def timed_connect(dialect, conn_rec, cargs, cparams):
+        start = time.perf_counter()
+        connection = dialect.connect(*cargs, **cparams)
+        stats.connect_ms.observe((time.perf_counter() - start) * 1000)
+        stats.connects += 1
+        return connection
+
+    @event.listens_for(engine, 'checkout')
+    def count_checkout(dbapi_connection, connection_record, connection_proxy):
+        stats.checkouts += 1
+
+    @event.listens_for(engine, 'invalidate')
+    def count_invalidate(dbapi_connection, connection_record, exception):
+        stats.invalidated += 1
+
+    return stats
+
+
+def pool_status(engine, stats):
+    pool = engine.pool
+    status = {
+        'pool': type(pool).__name__,
+        'checkouts': stats.checkouts,
+        'connects': stats.connects,
+        'invalidated': stats.invalidated,
+        'wait_ms': stats.wait_ms.to_dict(),
+        'connect_ms': stats.connect_ms.to_dict(),
+    }
+    # Only QueuePool knows how big it is
+    for name in ('size', 'checkedin', 'checkedout', 'overflow'):
+        if hasattr(pool, name):
+            status[name] = getattr(pool, name)()
+    if hasattr(pool, 'timeout'):
+        status['timeout'] = pool.timeout()
+    return status
@@ -0,0 +1,23 @@
+from flask import current_app
+from flask_sqlalchemy import SQLAlchemy
+from flask_migrate import Migrate
+from flask_login import LoginManager
+from flask_ckeditor import CKEditor
+
+from passwords import PasswordHasher
+from replicas import RoutingSession
+
+# Created here, bound to the app in create_app()
+db = SQLAlchemy(session_options={'class_': RoutingSession})
+migrate = Migrate()
+ckeditor = CKEditor()
+hasher = PasswordHasher()
+
+# Flask_Login Stuff
+login_manager = LoginManager()
+login_manager.login_view = 'auth.login'
+
+
+def get_cache(name):
+    # Caches are built from the app's config, see create_app()
+    return current_app.extensions['caches'][name]
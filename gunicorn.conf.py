@@ -0,0 +1,28 @@
+import multiprocessing
+import os
+
+# gunicorn -c gunicorn.conf.py
+#
+# GUNICORN_MODE picks how a worker handles requests:
+#   sync     one request at a time (gunicorn's default)
+#   gthread  GUNICORN_THREADS requests at once, one thread each
+#   asgi     uvicorn (asgi.py) - slow clients wait on the event loop and
+#            don't hold a thread, requests run in ASGI_THREADS threads
+# Keep DB_POOL_SIZE + DB_MAX_OVERFLOW at least as big as the thread count.
+
+mode = os.getenv('GUNICORN_MODE', 'sync')
+bind = os.getenv('GUNICORN_BIND', '0.0.0.0:' + os.getenv('PORT', '8000'))
+workers = int(os.getenv('WEB_CONCURRENCY', multiprocessing.cpu_count() * 2 + 1))
+timeout = int(os.getenv('GUNICORN_TIMEOUT', 30))
+
+if mode == 'sync':
+    wsgi_app = 'wsgi:app'
+elif mode == 'gthread':
+    wsgi_app = 'wsgi:app'
+    worker_class = 'gthread'
+    threads = int(os.getenv('GUNICORN_THREADS', 8))
+elif mode == 'asgi':
+    wsgi_app = 'asgi:app'
+    worker_class = 'uvicorn.workers.UvicornWorker'
+else:
+    raise RuntimeError(f'Unknown GUNICORN_MODE {mode!r} - use sync, gthread or asgi')
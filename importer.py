@@ -0,0 +1,250 @@
+import csv
+import itertools
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+import click
+from flask.cli import AppGroup
+from werkzeug.security import generate_password_hash
+
+from flask import current_app
+
+from content import render_post, slugify
+from pagecache import purge_pages
+from extensions import db, hasher
+from models import Users, Posts, ImportProgress, search_index, slug_usage
+
+# Bulk import
+#
+#   flask import users users.csv
+#   flask import posts posts.jsonl --batch-size 5000
+#
+# Rows are inserted with one executemany per batch, and each batch is its
+# own transaction together with the "rows done" checkpoint for the file.
+# Run the same command again after a failure and it carries on from the
+# last batch that committed. Rows piped in on stdin ("-") have nothing to
+# tell one stream from the next, so those imports keep no checkpoint and
+# can't be resumed.
+
+import_group = AppGroup('import', help='Bulk import users or posts from CSV or JSONL.')
+
+USER_FIELDS = ('username', 'name', 'email', 'favorite_color', 'about_author')
+POST_FIELDS = ('title', 'content')
+
+
+def read_rows(path, format=None):
+    format = format or ('csv' if path.endswith('.csv') else 'jsonl')
+    f = sys.stdin if path == '-' else open(path, newline='', encoding='utf-8')
+    try:
+        if format == 'csv':
+            yield from csv.DictReader(f)
+        else:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+    finally:
+        if f is not sys.stdin:
+            f.close()
+
+
+def batches(rows, size):
+    rows = iter(rows)
+    while True:
+        batch = list(itertools.islice(rows, size))
+        if not batch:
+            return
+        yield batch
+
+
+def parse_date(value):
+    return datetime.fromisoformat(value) if value else None
+
+
+class Progress:
+    def __init__(self, kind, already_done):
+        self.kind = kind
+        self.done = already_done
+        self.inserted = 0
+        self.start = time.perf_counter()
+
+    def update(self, count):
+        self.done += count
+        self.inserted += count
+        elapsed = time.perf_counter() - self.start
+        click.echo(f'{self.kind}: {self.done} rows ({self.inserted / elapsed:.0f} rows/s)')
+
+
+def checked_rows(rows, check_row, first, retry):
+    # Stop at the first bad row, before any of its batch is written
+    for number, row in enumerate(rows, first):
+        problem = check_row(row)
+        if problem:
+            raise click.ClickException(f'Row {number}: {problem}. Fix it and {retry}.')
+        yield row
+
+
+def run_import(kind, path, format, batch_size, resume, prepare, before_commit=None,
+               check_row=None):
+    if path == '-':
+        if resume:
+            raise click.UsageError("Can't resume an import from stdin, import from a file.")
+        progress_row = None
+        skip = 0
+        retry = 'import the rest from a file'
+    else:
+        source = f'{kind}:{os.path.abspath(path)}'
+        progress_row = db.session.get(ImportProgress, source)
+        if progress_row is None:
+            progress_row = ImportProgress(source=source, rows_done=0)
+            db.session.add(progress_row)
+        elif resume is False:
+            progress_row.rows_done = 0
+        skip = progress_row.rows_done
+        retry = 'run the same command to resume'
+    if skip:
+        click.echo(f'Resuming {kind} after {skip} rows')
+
+    progress = Progress(kind, skip)
+    rows = itertools.islice(read_rows(path, format), skip, None)
+    if check_row is not None:
+        rows = checked_rows(rows, check_row, skip + 1, retry)
+    for batch in batches(rows, batch_size):
+        records = prepare(batch)
+        try:
+            last_id = db.session.query(db.func.max(kind_table(kind).c.id)).scalar() or 0
+            db.session.execute(kind_table(kind).insert(), records)
+            if before_commit is not None:
+                before_commit(last_id)
+            if progress_row is not None:
+                progress_row.rows_done += len(batch)
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            click.echo(f'Failed after {progress.done} rows - {retry}', err=True)
+            raise
+        progress.update(len(batch))
+    return progress
+
+
+def kind_table(kind):
+    return Users.__table__ if kind == 'users' else Posts.__table__
+
+
+@import_group.command('users')
+@click.argument('path')
+@click.option('--format', type=click.Choice(['csv', 'jsonl']), help='Default: from the file name.')
+@click.option('--batch-size', default=1000, show_default=True)
+@click.option('--workers', default=os.cpu_count(), show_default=True,
+              help='Processes hashing passwords.')
+@click.option('--resume/--restart', default=None,
+              help='Default: resume, unless reading stdin.')
+def import_users(path, format, batch_size, workers, resume):
+    """Import users. Rows have username, name, email, favorite_color,
+    about_author and either password or an already hashed password_hash."""
+    method = hasher.method
+
+    def check_row(row):
+        if not row.get('password') and not row.get('password_hash'):
+            return 'needs a password or a password_hash'
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        def prepare(batch):
+            # Hash the whole batch at once, spread over the pool
+            plain = [row for row in batch if not row.get('password_hash')]
+            hashes = pool.map(generate_password_hash, [row['password'] for row in plain],
+                              itertools.repeat(method),
+                              chunksize=max(1, len(plain) // (workers * 4)))
+            for row, password_hash in zip(plain, hashes):
+                row['password_hash'] = password_hash
+            now = datetime.utcnow()
+            return [dict({field: row.get(field) or None for field in USER_FIELDS},
+                         password_hash=row['password_hash'],
+                         date_added=parse_date(row.get('date_added')) or now,
+                         date_modified=now, version=1)
+                    for row in batch]
+
+        progress = run_import('users', path, format, batch_size, resume, prepare,
+                              check_row=check_row)
+    click.echo(f'Imported {progress.inserted} users')
+
+
+@import_group.command('posts')
+@click.argument('path')
+@click.option('--format', type=click.Choice(['csv', 'jsonl']), help='Default: from the file name.')
+@click.option('--batch-size', default=1000, show_default=True)
+@click.option('--resume/--restart', default=None,
+              help='Default: resume, unless reading stdin.')
+@click.option('--index/--no-index', default=True, show_default=True,
+              help='Add the new posts to the search index.')
+def import_posts(path, format, batch_size, resume, index):
+    """Import posts. Rows have title, content, slug, date_posted and either
+    poster_id or the author's username."""
+    poster_ids = {}
+
+    def poster_id(row):
+        if row.get('poster_id'):
+            return int(row['poster_id'])
+        username = row.get('username')
+        if username and username not in poster_ids:
+            poster_ids[username] = (db.session.query(Users.id)
+                                    .filter_by(username=username).scalar())
+        return poster_ids.get(username)
+
+    excerpt_length = current_app.config['POST_EXCERPT_LENGTH']
+
+    # Every slug this import has used, explicit or numbered, and for each
+    # slug that needed numbers the highest n handed out (see models.slug_usage)
+    reserved = set()
+    slug_numbers = {}
+
+    def slugs(batch):
+        # One query for which of the batch's slugs the database has. A taken
+        # slug costs one more query for its numbers, once per import.
+        bases = [slugify(row.get('slug') or row.get('title')) for row in batch]
+        unseen = set(bases) - reserved
+        taken = set()
+        if unseen:
+            taken = {slug for (slug,) in
+                     db.session.query(Posts.slug).filter(Posts.slug.in_(unseen))}
+        result = []
+        for base in bases:
+            slug = base
+            if base in reserved or base in taken:
+                number = slug_numbers.get(base)
+                if number is None:
+                    # Past the database's highest, so only this import's
+                    # own slugs (e.g. an explicit base-2) can be in the way
+                    number = max(slug_usage(base)[1], 1)
+                number += 1
+                while f'{base}-{number}' in reserved:
+                    number += 1
+                slug_numbers[base] = number
+                slug = f'{base}-{number}'
+            reserved.add(slug)
+            result.append(slug)
+        return result
+
+    def prepare(batch):
+        now = datetime.utcnow()
+        return [dict({field: row.get(field) for field in POST_FIELDS},
+                     slug=slug, poster_id=poster_id(row),
+                     date_posted=parse_date(row.get('date_posted')) or now,
+                     date_modified=now, version=1,
+                     **render_post(row.get('content'), excerpt_length))
+                for row, slug in zip(batch, slugs(batch))]
+
+    def index_batch(last_id):
+        # executemany doesn't hand back ids, so index everything newer than
+        # before the insert, in the same transaction. Re-indexing a post
+        # someone added meanwhile is harmless.
+        for post in Posts.query.filter(Posts.id > last_id):
+            search_index.index_post(post)
+
+    progress = run_import('posts', path, format, batch_size, resume, prepare,
+                          before_commit=index_batch if index else None)
+    purge_pages('/posts')
+    click.echo(f'Imported {progress.inserted} posts')
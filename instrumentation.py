@@ -0,0 +1,258 @@
+import json
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from functools import wraps
+from flask import g, has_app_context, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+
+# SQL statement counting
+#
+# Every statement run through any engine bumps the counter for the current
+# request (g.query_count) and for any active query_budget() blocks, and
+# its time goes into the request's 'sql' timing.
+
+_local = threading.local()
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+class QueryCounter:
+    def __init__(self):
+        self.count = 0
+        self.statements = []
+
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def _count_query(conn, cursor, statement, parameters, context, executemany):
+    if has_app_context():
+        g.query_count = g.get('query_count', 0) + 1
+    for counter in getattr(_local, 'counters', []):
+        counter.count += 1
+        counter.statements.append(statement)
+    if context is not None:
+        context._query_start = time.perf_counter()
+
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def _time_query(conn, cursor, statement, parameters, context, executemany):
+    start = getattr(context, '_query_start', None)
+    if start is not None:
+        record_timing('sql', (time.perf_counter() - start) * 1000)
+
+
+def get_query_count():
+    return g.get('query_count', 0)
+
+
+@contextmanager
+def query_budget(limit):
+    # with query_budget(3): client.get('/posts')
+    counter = QueryCounter()
+    counters = getattr(_local, 'counters', None)
+    if counters is None:
+        counters = _local.counters = []
+    counters.append(counter)
+    try:
+        yield counter
+    finally:
+        counters.remove(counter)
+    if counter.count > limit:
+        raise QueryBudgetExceeded(
+            f'{counter.count} queries run, budget is {limit}:\n' + '\n'.join(counter.statements))
+
+
+def init_query_counter(app):
+    # Report the per-request count, and complain when a route goes over
+    # SQL_QUERY_BUDGET (raise while testing, log otherwise)
+    @app.after_request
+    def report_query_count(response):
+        count = get_query_count()
+        response.headers['X-Query-Count'] = str(count)
+        budget = app.config.get('SQL_QUERY_BUDGET')
+        if budget and count > budget:
+            message = f'{count} queries run for {request.path}, budget is {budget}'
+            if app.testing:
+                raise QueryBudgetExceeded(message)
+            app.logger.warning(message)
+        return response
+
+
+# Request timings
+#
+# timed() adds the time spent in a block to g.timings under a name, and
+# with SERVER_TIMING on they are sent back as a Server-Timing header.
+
+
+def record_timing(name, ms):
+    if has_request_context():
+        timings = g.setdefault('timings', {})
+        timings[name] = timings.get(name, 0) + ms
+
+
+@contextmanager
+def timed(name):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_timing(name, (time.perf_counter() - start) * 1000)
+
+
+def server_timing_header(timings, descriptions=None):
+    descriptions = descriptions or {}
+    return ', '.join(f'{name};dur={ms:.2f}' + (f';desc="{descriptions[name]}"'
+                                              if name in descriptions else '')
+                     for name, ms in timings.items())
+
+
+def init_render_profile(app):
+    # Call after the blueprints are registered, so their context processors
+    # are the ones being wrapped
+
+    # Context processors run on every render
+    def timed_processor(processor):
+        @wraps(processor)
+        def wrapper():
+            with timed('context'):
+                return processor()
+        return wrapper
+
+    for processors in app.template_context_processors.values():
+        processors[:] = [timed_processor(processor) for processor in processors]
+
+    # Templates. Only the outermost render is counted, fragments rendered
+    # from inside a page are part of that page's time.
+    class TimedTemplate(app.jinja_env.template_class):
+        def render(self, *args, **kwargs):
+            if not has_request_context() or g.get('rendering'):
+                return super().render(*args, **kwargs)
+            g.rendering = True
+            try:
+                with timed('template'):
+                    return super().render(*args, **kwargs)
+            finally:
+                g.rendering = False
+
+    app.jinja_env.template_class = TimedTemplate
+
+
+# Request profile
+#
+# Every view is timed as 'view', and the whole request as 'total'. With
+# SERVER_TIMING on the timings go back in a Server-Timing header. Requests
+# slower than SLOW_REQUEST_MS are logged as one JSON line on the
+# 'slow_requests' logger, and with SLOW_REQUEST_PROFILE on that line also
+# carries the stacks a sampling profiler caught the request in.
+
+
+class StackSampler:
+    # Every `interval` seconds, note where each thread that is serving a
+    # request is. Samples are kept per thread as collapsed stacks
+    # ("outer;inner;innermost" - the flamegraph format) with counts.
+
+    def __init__(self, interval, depth=40):
+        self.interval = interval
+        self.depth = depth
+        self._samples = {}
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def _ensure_started(self):
+        # Started on first use, so each gunicorn worker runs its own after the fork
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='stack-sampler',
+                                                daemon=True)
+                self._thread.start()
+
+    def start(self):
+        self._ensure_started()
+        self._samples[threading.get_ident()] = Counter()
+
+    def stop(self):
+        return self._samples.pop(threading.get_ident(), None)
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            frames = sys._current_frames()
+            for ident, samples in list(self._samples.items()):
+                frame = frames.get(ident)
+                if frame is not None:
+                    samples[self.collapse(frame)] += 1
+
+    def collapse(self, frame):
+        stack = []
+        while frame is not None and len(stack) < self.depth:
+            code = frame.f_code
+            stack.append(f'{code.co_filename}:{code.co_name}:{frame.f_lineno}')
+            frame = frame.f_back
+        return ';'.join(reversed(stack))
+
+
+def init_request_profile(app):
+    # Call last, once every view (static included) is registered
+    def timed_view(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            with timed('view'):
+                return view(*args, **kwargs)
+        return wrapper
+
+    for endpoint, view in list(app.view_functions.items()):
+        app.view_functions[endpoint] = timed_view(view)
+
+    sampler = None
+    if app.config.get('SLOW_REQUEST_PROFILE'):
+        sampler = StackSampler(app.config['SLOW_REQUEST_PROFILE_INTERVAL_MS'] / 1000)
+    slow_log = app.logger.getChild('slow_requests')
+
+    @app.before_request
+    def start_profile():
+        g.request_start = time.perf_counter()
+        if sampler is not None:
+            sampler.start()
+
+    @app.after_request
+    def finish_profile(response):
+        if 'request_start' not in g:
+            return response
+        total = (time.perf_counter() - g.request_start) * 1000
+        timings = g.setdefault('timings', {})
+        timings['total'] = total
+        samples = sampler.stop() if sampler is not None else None
+
+        if app.config.get('SERVER_TIMING'):
+            response.headers['Server-Timing'] = server_timing_header(
+                timings, {'sql': f'{get_query_count()} queries'})
+
+        threshold = app.config.get('SLOW_REQUEST_MS')
+        if threshold and total >= threshold:
+            record = {
+                'method': request.method,
+                'path': request.path,
+                'endpoint': request.endpoint,
+                'status': response.status_code,
+                'ms': round(total, 2),
+                'queries': get_query_count(),
+                'timings': {name: round(ms, 2) for name, ms in timings.items()},
+            }
+            if samples:
+                record['samples'] = sum(samples.values())
+                record['stacks'] = [{'stack': stack, 'count': count}
+                                    for stack, count in samples.most_common(10)]
+            slow_log.warning(json.dumps(record))
+        return response
+
+    if sampler is not None:
+        # A request that failed before after_request still has to stop sampling
+        @app.teardown_request
+        def stop_profile(exc):
+            sampler.stop()
@@ -0,0 +1,215 @@
+import json
+import random
+import signal
+import threading
+import time
+import traceback
+from datetime import datetime, timedelta
+
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+from sqlalchemy import and_, event, func, or_
+from sqlalchemy.orm import Session
+
+from extensions import db
+from models import Jobs
+
+# Background jobs
+#
+# Work that doesn't have to happen before the response goes out is
+# queued as a row in the jobs table, in the same transaction as whatever
+# asked for it, so a job is never lost and never runs for a write that
+# rolled back. `flask worker` runs them:
+#
+#   @job('index_post')
+#   def index_post(post_id): ...
+#
+#   enqueue('index_post', post_id=post.id)
+#   db.session.commit()
+#
+# A job that raises is tried again later, waiting twice as long each
+# time, until it has failed max_attempts times.
+#
+# JOBS_INLINE is on unless turned off, so a plain `flask run` needs no
+# worker: jobs then run in the web process once the transaction that
+# queued them commits (and not at all if it rolls back), at the end of
+# the request. Turn it off wherever `flask worker` runs.
+
+JOBS = {}
+# How long a job may run before another worker assumes it died
+LOCK_SECONDS = 300
+# Finished jobs are deleted after this long
+KEEP_DONE = timedelta(days=7)
+# How long a worker thread waits after an error outside a job (e.g. the
+# database went away) before it tries again
+ERROR_WAIT = 5
+
+
+def job(name):
+    def register(fn):
+        JOBS[name] = fn
+        return fn
+    return register
+
+
+def enqueue(name, max_attempts=None, **kwargs):
+    if name not in JOBS:
+        raise KeyError(f'No job called {name!r}')
+    if current_app.config['JOBS_INLINE']:
+        # Tied to the caller's transaction, which may not have started yet
+        session = db.session()
+        if not session.in_transaction():
+            session.begin()
+        session.info.setdefault('inline_jobs', []).append((name, kwargs))
+        return None
+    row = Jobs(name=name, args=json.dumps(kwargs), status='queued', attempts=0,
+               max_attempts=max_attempts or current_app.config['JOBS_MAX_ATTEMPTS'],
+               run_at=datetime.utcnow())
+    db.session.add(row)
+    return row
+
+
+@event.listens_for(Session, 'after_commit')
+def _inline_jobs_committed(session):
+    # No SQL allowed in here - they run in run_inline_jobs()
+    queued = session.info.pop('inline_jobs', None)
+    if queued:
+        session.info.setdefault('inline_jobs_due', []).extend(queued)
+
+
+@event.listens_for(Session, 'after_transaction_end')
+def _inline_jobs_rolled_back(session, transaction):
+    # Still here after the outermost transaction ended: it didn't commit
+    if transaction.parent is None:
+        session.info.pop('inline_jobs', None)
+
+
+def run_inline_jobs(exc=None):
+    if not db.session.registry.has():
+        return
+    while db.session.info.get('inline_jobs_due'):
+        name, kwargs = db.session.info['inline_jobs_due'].pop(0)
+        try:
+            JOBS[name](**kwargs)
+        except Exception:
+            db.session.rollback()
+            current_app.logger.exception('Inline job %s failed', name)
+
+
+def init_jobs(app):
+    # Runs before Flask-SQLAlchemy's own teardown removes the session
+    if app.config['JOBS_INLINE']:
+        app.teardown_appcontext(run_inline_jobs)
+
+
+def backoff(attempts, base):
+    # base, 2 * base, 4 * base ... plus up to 10% so retries spread out
+    delay = base * 2 ** (attempts - 1)
+    return delay + random.uniform(0, delay / 10)
+
+
+def due_filter(now):
+    return or_(and_(Jobs.status == 'queued', Jobs.run_at <= now),
+               and_(Jobs.status == 'running', Jobs.locked_until < now))
+
+
+def claim():
+    # Take the next due job, or None. The UPDATE only matches while the
+    # job is still due, so two workers can't both take it.
+    now = datetime.utcnow()
+    due = (db.session.query(Jobs.id).filter(due_filter(now))
+           .order_by(Jobs.run_at).limit(5).all())
+    for (job_id,) in due:
+        claimed = (Jobs.query.filter(Jobs.id == job_id, due_filter(now))
+                   .update({'status': 'running', 'attempts': Jobs.attempts + 1,
+                            'locked_until': now + timedelta(seconds=LOCK_SECONDS)},
+                           synchronize_session=False))
+        db.session.commit()
+        if claimed:
+            return db.session.get(Jobs, job_id)
+    return None
+
+
+def run(row):
+    try:
+        JOBS[row.name](**json.loads(row.args))
+    except Exception:
+        db.session.rollback()
+        row = db.session.get(Jobs, row.id)
+        row.last_error = traceback.format_exc()[-4000:]
+        if row.attempts >= row.max_attempts:
+            row.status = 'failed'
+            row.date_finished = datetime.utcnow()
+        else:
+            row.status = 'queued'
+            row.run_at = datetime.utcnow() + timedelta(
+                seconds=backoff(row.attempts, current_app.config['JOBS_RETRY_SECONDS']))
+        current_app.logger.warning('Job %s %s failed (attempt %d of %d)', row.id, row.name,
+                                   row.attempts, row.max_attempts)
+    else:
+        row.status = 'done'
+        row.date_finished = datetime.utcnow()
+    row.locked_until = None
+    db.session.commit()
+
+
+def prune():
+    Jobs.query.filter(Jobs.status == 'done',
+                      Jobs.date_finished < datetime.utcnow() - KEEP_DONE).delete()
+    db.session.commit()
+
+
+def work(app, poll, stop, burst=False):
+    while not stop.is_set():
+        try:
+            with app.app_context():
+                row = claim()
+                if row is not None:
+                    run(row)
+                    continue
+        except Exception:
+            # Keep the thread alive - the job, if any, is retried once its lock runs out
+            app.logger.exception('Worker error, trying again in %d seconds', ERROR_WAIT)
+            stop.wait(ERROR_WAIT)
+            continue
+        if burst:
+            return
+        stop.wait(poll)
+
+
+def job_counts():
+    return dict(db.session.query(Jobs.status, func.count(Jobs.id)).group_by(Jobs.status).all())
+
+
+@click.command('worker')
+@click.option('--threads', type=int, help='Jobs run at once (default: JOBS_WORKER_THREADS).')
+@click.option('--poll', default=1.0, show_default=True,
+              help='Seconds between looks at an empty queue.')
+@click.option('--burst', is_flag=True, help='Stop once the queue is empty.')
+@with_appcontext
+def worker_command(threads, poll, burst):
+    """Run queued background jobs. Start more of these for more processes."""
+    app = current_app._get_current_object()
+    threads = threads or app.config['JOBS_WORKER_THREADS']
+    prune()
+    if app.config['JOBS_INLINE']:
+        click.echo('JOBS_INLINE is on, so web processes with the same settings run their '
+                   'jobs themselves instead of queueing them', err=True)
+    click.echo(f'Worker running {threads} threads, jobs: {", ".join(sorted(JOBS))}')
+    stop = threading.Event()
+    # Let the running jobs finish when the process manager stops us
+    signal.signal(signal.SIGTERM, lambda signum, frame: stop.set())
+    pool = [threading.Thread(target=work, args=(app, poll, stop, burst), daemon=True)
+            for _ in range(threads)]
+    for thread in pool:
+        thread.start()
+    try:
+        while any(thread.is_alive() for thread in pool):
+            time.sleep(0.5)
+    except KeyboardInterrupt:
+        stop.set()
+    if stop.is_set():
+        click.echo('Stopping after the running jobs finish')
+        for thread in pool:
+            thread.join()
@@ -0,0 +1,322 @@
+import atexit
+import os
+import sqlite3
+import threading
+import time
+import weakref
+from bisect import bisect_left
+from collections import defaultdict
+
+from flask import current_app, g, request
+
+from dbpool import pool_status
+from extensions import db
+
+
+# Prometheus metrics
+#
+# Every gunicorn worker keeps its numbers in memory and adds them to a
+# SQLite file shared by all the workers on the node once a second (or so),
+# so /admin/metrics reports the whole node whichever worker answers it.
+#
+# Counters are summed in the file. Gauges (in flight requests, pool usage)
+# are kept per worker process and summed when read, skipping workers that
+# have exited.
+
+# Request duration bucket upper bounds, in seconds
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+# name: (type, help)
+METRICS = {
+    'flasker_http_requests_total': (
+        'counter', 'Requests handled, by endpoint, method and status.'),
+    'flasker_http_request_duration_seconds': (
+        'histogram', 'Time to handle a request, by endpoint.'),
+    'flasker_http_requests_in_flight': (
+        'gauge', 'Requests being handled right now.'),
+    'flasker_db_pool_size': (
+        'gauge', 'Connections each pool keeps open, summed over workers.'),
+    'flasker_db_pool_checked_out': (
+        'gauge', 'Connections in use.'),
+    'flasker_db_pool_overflow': (
+        'gauge', 'Connections open beyond the pool size.'),
+    'flasker_db_pool_checkouts_total': (
+        'counter', 'Connections handed out by the pool.'),
+    'flasker_db_pool_connects_total': (
+        'counter', 'New database connections opened.'),
+    'flasker_db_pool_invalidated_total': (
+        'counter', 'Connections thrown away after an error or failed ping.'),
+    'flasker_cache_hits_total': (
+        'counter', 'Cache lookups that found a value.'),
+    'flasker_cache_misses_total': (
+        'counter', 'Cache lookups that found nothing.'),
+    'flasker_cache_hit_ratio': (
+        'gauge', 'Hits over lookups since the metrics file was created.'),
+    'flasker_rate_limit_allowed_total': (
+        'counter', 'Requests let through by a rate limit, by endpoint and key.'),
+    'flasker_rate_limit_rejected_total': (
+        'counter', 'Requests turned away with a 429, by endpoint and key.'),
+}
+
+
+# Stores with numbers to write out when the process exits
+_stores = weakref.WeakSet()
+
+
+@atexit.register
+def _flush_at_exit():
+    for store in list(_stores):
+        try:
+            store.flush()
+        except sqlite3.Error:
+            pass
+
+
+def format_labels(**labels):
+    def escape(value):
+        return str(value).replace('\\', r'\\').replace('"', r'\"').replace('\n', r'\n')
+    return ','.join(f'{name}="{escape(value)}"' for name, value in labels.items())
+
+
+def pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+class MetricsStore:
+    def __init__(self, path, flush_interval=1.0):
+        self.path = path
+        self.flush_interval = flush_interval
+        self._counters = defaultdict(float)
+        self._gauges = {}
+        self._last_seen = {}
+        self._last_flush = time.monotonic()
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        conn = self._connect()
+        conn.execute('CREATE TABLE IF NOT EXISTS counters ('
+                     'name TEXT, labels TEXT, value REAL, PRIMARY KEY (name, labels))')
+        conn.execute('CREATE TABLE IF NOT EXISTS gauges ('
+                     'name TEXT, labels TEXT, pid INTEGER, value REAL, '
+                     'PRIMARY KEY (name, labels, pid))')
+
+    def _connect(self):
+        # sqlite3 connections can't be shared between threads (or a fork)
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def inc(self, name, labels='', amount=1):
+        with self._lock:
+            self._counters[name, labels] += amount
+
+    def set_gauge(self, name, labels, value):
+        with self._lock:
+            self._gauges[name, labels] = value
+
+    def set_total(self, name, labels, total):
+        # For counters something else keeps (cache hits): add what's new since last time
+        key = name, labels
+        with self._lock:
+            delta = total - self._last_seen.get(key, 0)
+            self._last_seen[key] = total
+            if delta > 0:
+                self._counters[key] += delta
+
+    def observe(self, name, labels, value, buckets=BUCKETS):
+        # Buckets are stored as plain counts and added up when rendered
+        index = bisect_left(buckets, value)
+        le = str(buckets[index]) if index < len(buckets) else '+Inf'
+        bucket_labels = f'{labels},le="{le}"' if labels else f'le="{le}"'
+        with self._lock:
+            self._counters[name + '_bucket', bucket_labels] += 1
+            self._counters[name + '_sum', labels] += value
+            self._counters[name + '_count', labels] += 1
+
+    def due(self):
+        return time.monotonic() - self._last_flush >= self.flush_interval
+
+    def flush(self):
+        with self._lock:
+            counters, self._counters = self._counters, defaultdict(float)
+            gauges = dict(self._gauges)
+            self._last_flush = time.monotonic()
+        pid = os.getpid()
+        conn = self._connect()
+        try:
+            conn.execute('BEGIN IMMEDIATE')
+            conn.executemany(
+                'INSERT INTO counters (name, labels, value) VALUES (?, ?, ?) '
+                'ON CONFLICT (name, labels) DO UPDATE SET value = value + excluded.value',
+                [(name, labels, value) for (name, labels), value in counters.items()])
+            conn.executemany(
+                'INSERT OR REPLACE INTO gauges (name, labels, pid, value) VALUES (?, ?, ?, ?)',
+                [(name, labels, pid, value) for (name, labels), value in gauges.items()])
+            conn.execute('COMMIT')
+        except Exception:
+            if conn.in_transaction:
+                conn.execute('ROLLBACK')
+            # Keep them for the next flush
+            with self._lock:
+                for key, value in counters.items():
+                    self._counters[key] += value
+            raise
+
+    def collect(self):
+        # {name: [(labels, value)]} for the whole node
+        conn = self._connect()
+        pids = [pid for (pid,) in conn.execute('SELECT DISTINCT pid FROM gauges')]
+        dead = [pid for pid in pids if not pid_alive(pid)]
+        if dead:
+            conn.executemany('DELETE FROM gauges WHERE pid = ?', [(pid,) for pid in dead])
+        samples = defaultdict(list)
+        rows = conn.execute(
+            'SELECT name, labels, value FROM counters UNION ALL '
+            'SELECT name, labels, SUM(value) FROM gauges GROUP BY name, labels '
+            'ORDER BY name, labels')
+        for name, labels, value in rows:
+            samples[name].append((labels, value))
+        return samples
+
+
+def cumulative_buckets(rows):
+    # Turn per-bucket counts into Prometheus' running totals, per label set
+    series = defaultdict(dict)
+    for labels, value in rows:
+        rest, le = labels.rsplit('le="', 1)
+        series[rest.rstrip(',')][le.rstrip('"')] = value
+    out = []
+    for rest, counts in series.items():
+        total = 0
+        for le in [str(bound) for bound in BUCKETS] + ['+Inf']:
+            total += counts.get(le, 0)
+            out.append((f'{rest},le="{le}"' if rest else f'le="{le}"', total))
+    return out
+
+
+def hit_ratios(samples):
+    hits = dict(samples.get('flasker_cache_hits_total', []))
+    misses = dict(samples.get('flasker_cache_misses_total', []))
+    ratios = []
+    for labels in sorted(set(hits) | set(misses)):
+        lookups = hits.get(labels, 0) + misses.get(labels, 0)
+        ratios.append((labels, hits.get(labels, 0) / lookups if lookups else 0))
+    return ratios
+
+
+def render(samples):
+    samples['flasker_cache_hit_ratio'] = hit_ratios(samples)
+    lines = []
+    for name, (kind, help) in METRICS.items():
+        lines.append(f'# HELP {name} {help}')
+        lines.append(f'# TYPE {name} {kind}')
+        if kind == 'histogram':
+            series = [(name + '_bucket', cumulative_buckets(samples.get(name + '_bucket', []))),
+                      (name + '_sum', samples.get(name + '_sum', [])),
+                      (name + '_count', samples.get(name + '_count', []))]
+        else:
+            series = [(name, samples.get(name, []))]
+        for series_name, rows in series:
+            for labels, value in rows:
+                value = int(value) if float(value).is_integer() else value
+                lines.append(f'{series_name}{{{labels}}} {value}' if labels
+                             else f'{series_name} {value}')
+    return '\n'.join(lines) + '\n'
+
+
+def snapshot(app, store, in_flight):
+    # This worker's gauges and the counters other code keeps for itself
+    store.set_gauge('flasker_http_requests_in_flight', '', in_flight)
+
+    status = pool_status(db.engine, app.extensions['pool_stats'])
+    # Only a QueuePool has sizes (not SQLite's)
+    for name, metric in (('size', 'flasker_db_pool_size'),
+                         ('checkedout', 'flasker_db_pool_checked_out'),
+                         ('overflow', 'flasker_db_pool_overflow')):
+        if name in status:
+            store.set_gauge(metric, '', status[name])
+    for name in ('checkouts', 'connects', 'invalidated'):
+        store.set_total(f'flasker_db_pool_{name}_total', '', status[name])
+
+    for name, cache in app.extensions['caches'].items():
+        stats = cache.stats()
+        tiers = stats.items() if 'local' in stats else [('local', stats)]
+        for tier, tier_stats in tiers:
+            labels = format_labels(cache=name, tier=tier)
+            store.set_total('flasker_cache_hits_total', labels, tier_stats['hits'])
+            store.set_total('flasker_cache_misses_total', labels, tier_stats['misses'])
+
+    limiter = app.extensions.get('rate_limiter')
+    if limiter is not None:
+        for (endpoint, scope), counts in limiter.stats().items():
+            labels = format_labels(endpoint=endpoint, scope=scope)
+            store.set_total('flasker_rate_limit_allowed_total', labels, counts['allowed'])
+            store.set_total('flasker_rate_limit_rejected_total', labels, counts['rejected'])
+
+
+def init_metrics(app):
+    path = app.config['METRICS_PATH'] or os.path.join(app.instance_path, 'metrics.db')
+    store = MetricsStore(path, app.config['METRICS_FLUSH_INTERVAL'])
+    app.extensions['metrics'] = store
+    in_flight = [0]
+    in_flight_lock = threading.Lock()
+    # Whatever hasn't been written yet when the worker stops
+    _stores.add(store)
+
+    @app.before_request
+    def start_request_metrics():
+        g.metrics_start = time.perf_counter()
+        with in_flight_lock:
+            in_flight[0] += 1
+
+    @app.after_request
+    def record_request_metrics(response):
+        if 'metrics_start' in g:
+            endpoint = request.endpoint or 'none'
+            store.inc('flasker_http_requests_total',
+                      format_labels(endpoint=endpoint, method=request.method,
+                                    status=response.status_code))
+            store.observe('flasker_http_request_duration_seconds',
+                          format_labels(endpoint=endpoint),
+                          time.perf_counter() - g.metrics_start)
+        return response
+
+    @app.teardown_request
+    def finish_request_metrics(exc):
+        if 'metrics_start' not in g:
+            return
+        with in_flight_lock:
+            in_flight[0] -= 1
+        if store.due():
+            try:
+                flush_metrics()
+            except sqlite3.OperationalError:
+                # Locked for too long - the numbers wait for the next flush,
+                # the request has already been answered
+                app.logger.warning('Could not write metrics to %s', store.path, exc_info=True)
+
+    def flush_metrics():
+        with in_flight_lock:
+            current = in_flight[0]
+        snapshot(app, store, current)
+        store.flush()
+
+    app.extensions['flush_metrics'] = flush_metrics
+
+
+def metrics_text():
+    current_app.extensions['flush_metrics']()
+    return render(current_app.extensions['metrics'].collect())
@@ -0,0 +1,37 @@
+"""Search Index
+
+Revision ID: 4b8e1f2a6c3d
+Revises: da016dbf2d60
+Create Date: 2026-10-18 09:12:31.204118
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '4b8e1f2a6c3d'
+down_revision = 'da016dbf2d60'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('search_index',
+                    sa.Column('term', sa.String(length=64), nullable=False),
+                    sa.Column('post_id', sa.Integer(), nullable=False),
+                    sa.Column('weight', sa.Integer(), nullable=False),
+                    sa.ForeignKeyConstraint(['post_id'], ['posts.id'], ),
+                    sa.PrimaryKeyConstraint('term', 'post_id')
+                    )
+    with op.batch_alter_table('search_index', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_search_index_post_id'), ['post_id'], unique=False)
+
+    # Existing posts are indexed with `flask reindex`
+
+
+def downgrade():
+    with op.batch_alter_table('search_index', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_search_index_post_id'))
+
+    op.drop_table('search_index')
@@ -0,0 +1,33 @@
+"""Rendered Post Content
+
+Revision ID: 6f1d3a8c2e57
+Revises: b5d2c8a4e913
+Create Date: 2026-10-18 16:02:41.180936
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '6f1d3a8c2e57'
+down_revision = 'b5d2c8a4e913'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Filled in on the next save, or for every post by `flask render-posts`
+    with op.batch_alter_table('posts', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('content_html', sa.Text(), nullable=True))
+        batch_op.add_column(sa.Column('excerpt', sa.Text(), nullable=True))
+        batch_op.add_column(sa.Column('word_count', sa.Integer(), nullable=True))
+        batch_op.add_column(sa.Column('reading_minutes', sa.Integer(), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('posts', schema=None) as batch_op:
+        batch_op.drop_column('reading_minutes')
+        batch_op.drop_column('word_count')
+        batch_op.drop_column('excerpt')
+        batch_op.drop_column('content_html')
@@ -0,0 +1,38 @@
+"""Modification Stamps
+
+Revision ID: 9c3a5e7f1b20
+Revises: 2d6f0b9e8a41
+Create Date: 2026-10-18 12:25:54.660841
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import mysql
+
+
+# revision identifiers, used by Alembic.
+revision = '9c3a5e7f1b20'
+down_revision = '2d6f0b9e8a41'
+branch_labels = None
+depends_on = None
+
+Timestamp = sa.DateTime().with_variant(mysql.DATETIME(fsp=6), 'mysql')
+
+
+def upgrade():
+    for table in ('posts', 'users'):
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            batch_op.add_column(sa.Column('date_modified', Timestamp, nullable=True))
+            batch_op.create_index(batch_op.f(f'ix_{table}_date_modified'), ['date_modified'],
+                                  unique=False)
+
+    # Existing rows count as modified when they were created
+    op.execute('UPDATE posts SET date_modified = date_posted')
+    op.execute('UPDATE users SET date_modified = date_added')
+
+
+def downgrade():
+    for table in ('users', 'posts'):
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            batch_op.drop_index(batch_op.f(f'ix_{table}_date_modified'))
+            batch_op.drop_column('date_modified')
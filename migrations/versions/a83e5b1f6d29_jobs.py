@@ -0,0 +1,47 @@
+"""Jobs
+
+Revision ID: a83e5b1f6d29
+Revises: 6f1d3a8c2e57
+Create Date: 2026-10-18 16:41:09.372514
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import mysql
+
+
+# revision identifiers, used by Alembic.
+revision = 'a83e5b1f6d29'
+down_revision = '6f1d3a8c2e57'
+branch_labels = None
+depends_on = None
+
+Timestamp = sa.DateTime().with_variant(mysql.DATETIME(fsp=6), 'mysql')
+
+
+def upgrade():
+    op.create_table('jobs',
+                    sa.Column('id', sa.Integer(), nullable=False),
+                    sa.Column('name', sa.String(length=100), nullable=False),
+                    sa.Column('args', sa.Text(), nullable=False),
+                    sa.Column('status', sa.String(length=20), nullable=False),
+                    sa.Column('attempts', sa.Integer(), nullable=False),
+                    sa.Column('max_attempts', sa.Integer(), nullable=False),
+                    sa.Column('run_at', Timestamp, nullable=False),
+                    sa.Column('locked_until', Timestamp, nullable=True),
+                    sa.Column('last_error', sa.Text(), nullable=True),
+                    sa.Column('date_added', Timestamp, nullable=True),
+                    sa.Column('date_finished', Timestamp, nullable=True),
+                    sa.PrimaryKeyConstraint('id')
+                    )
+    with op.batch_alter_table('jobs', schema=None) as batch_op:
+        batch_op.create_index('ix_jobs_status_run_at', ['status', 'run_at'], unique=False)
+        batch_op.create_index(batch_op.f('ix_jobs_date_added'), ['date_added'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('jobs', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_jobs_date_added'))
+        batch_op.drop_index('ix_jobs_status_run_at')
+
+    op.drop_table('jobs')
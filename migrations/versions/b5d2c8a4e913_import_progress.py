@@ -0,0 +1,31 @@
+"""Import Progress
+
+Revision ID: b5d2c8a4e913
+Revises: 9c3a5e7f1b20
+Create Date: 2026-10-18 13:08:19.447302
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import mysql
+
+
+# revision identifiers, used by Alembic.
+revision = 'b5d2c8a4e913'
+down_revision = '9c3a5e7f1b20'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('import_progress',
+                    sa.Column('source', sa.String(length=512), nullable=False),
+                    sa.Column('rows_done', sa.Integer(), nullable=False),
+                    sa.Column('date_modified', sa.DateTime().with_variant(
+                        mysql.DATETIME(fsp=6), 'mysql'), nullable=True),
+                    sa.PrimaryKeyConstraint('source')
+                    )
+
+
+def downgrade():
+    op.drop_table('import_progress')
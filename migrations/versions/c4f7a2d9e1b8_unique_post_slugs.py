@@ -0,0 +1,59 @@
+"""Unique Post Slugs
+
+Revision ID: c4f7a2d9e1b8
+Revises: a83e5b1f6d29
+Create Date: 2026-10-18 17:12:30.518204
+
+"""
+import re
+import unicodedata
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c4f7a2d9e1b8'
+down_revision = 'a83e5b1f6d29'
+branch_labels = None
+depends_on = None
+
+posts = sa.table('posts', sa.column('id', sa.Integer), sa.column('title', sa.String),
+                 sa.column('slug', sa.String), sa.column('version', sa.Integer))
+
+
+# A copy of content.slugify as it was for this migration
+def slugify(text):
+    text = unicodedata.normalize('NFKD', text or '').encode('ascii', 'ignore').decode()
+    slug = re.sub('[^a-z0-9]+', '-', text.lower()).strip('-')[:200].rstrip('-')
+    if not slug or slug.isdigit():
+        slug = f'post-{slug}' if slug else 'post'
+    return slug
+
+
+def upgrade():
+    # Slugs used to be free text: turn them into URL-safe ones, and give
+    # every post after the first with the same slug its id on the end
+    conn = op.get_bind()
+    rows = conn.execute(sa.select(posts.c.id, posts.c.title, posts.c.slug)
+                        .order_by(posts.c.id)).all()
+    taken = set()
+    for post_id, title, slug in rows:
+        new_slug = base = slugify(slug or title)
+        if new_slug in taken:
+            new_slug = f'{base}-{post_id}'
+        while new_slug in taken:
+            new_slug += '-2'
+        taken.add(new_slug)
+        if new_slug != slug:
+            # New version, so cached fragments with the old link go too
+            conn.execute(posts.update().where(posts.c.id == post_id)
+                         .values(slug=new_slug, version=posts.c.version + 1))
+
+    with op.batch_alter_table('posts', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_posts_slug'), ['slug'], unique=True)
+
+
+def downgrade():
+    with op.batch_alter_table('posts', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_posts_slug'))
@@ -0,0 +1,32 @@
+"""Version Stamps
+
+Revision ID: e7a90c4d5b12
+Revises: 4b8e1f2a6c3d
+Create Date: 2026-10-18 10:03:47.518220
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e7a90c4d5b12'
+down_revision = '4b8e1f2a6c3d'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('posts', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('version', sa.Integer(), nullable=False, server_default='1'))
+
+    with op.batch_alter_table('users', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('version', sa.Integer(), nullable=False, server_default='1'))
+
+
+def downgrade():
+    with op.batch_alter_table('users', schema=None) as batch_op:
+        batch_op.drop_column('version')
+
+    with op.batch_alter_table('posts', schema=None) as batch_op:
+        batch_op.drop_column('version')
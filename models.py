@@ -0,0 +1,192 @@
+from datetime import datetime
+from flask import has_app_context
+from flask_login import UserMixin
+from sqlalchemy import event
+from sqlalchemy.dialects import mysql
+from sqlalchemy.orm import Session, make_transient_to_detached, object_session
+
+from content import render_post, slugify
+from extensions import db, hasher, get_cache
+from search import InvertedIndex
+
+# Microseconds on MySQL too, so two saves in the same second still differ
+Timestamp = db.DateTime().with_variant(mysql.DATETIME(fsp=6), 'mysql')
+
+
+def load_user(user_id):
+    # Cache the user's row so a logged in page view doesn't start with a SELECT
+    user_cache = get_cache('user')
+    user_id = int(user_id)
+    row = user_cache.get(user_id)
+    if row is None:
+        user = Users.query.get(user_id)
+        if user is not None:
+            user_cache.set(user_id, {column.key: getattr(user, column.key)
+                                     for column in Users.__table__.columns})
+        return user
+    # Rebuild the user from the cached row and attach it to the session
+    # as if it had just been loaded
+    user = Users(**row)
+    make_transient_to_detached(user)
+    return db.session.merge(user, load=False)
+
+
+def get_user_for_update(user_id):
+    # The logged in user may be the cached copy above, so read the row
+    # again before changing it
+    return Users.query.populate_existing().get_or_404(user_id)
+
+# Create Model
+
+
+class Users(db.Model, UserMixin):
+    id = db.Column(db.Integer, primary_key=True)
+    username = db.Column(db.String(20), nullable=False, unique=True)
+    name = db.Column(db.String(200), nullable=False)
+    email = db.Column(db.String(200), nullable=False, unique=True)
+    favorite_color = db.Column(db.String(200))
+    about_author = db.Column(db.Text(), nullable=True)
+    date_added = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+    password_hash = db.Column(db.String(128))
+    # Bumped on every profile change
+    version = db.Column(db.Integer, nullable=False, default=1, server_default='1')
+    date_modified = db.Column(Timestamp, default=datetime.utcnow, onupdate=datetime.utcnow,
+                              index=True)
+
+    # User can have many posts
+    posts = db.relationship('Posts', backref='poster')
+
+    def bump_version(self):
+        # In SQL, so two workers changing the same user can't both write the same version
+        self.version = Users.version + 1
+
+    @property
+    def password(self):
+        raise AttributeError('password is not a readable attribute!')
+
+    @password.setter
+    def password(self, password):
+        self.password_hash = hasher.hash(password)
+
+    def verify_password(self, password):
+        return hasher.verify(self.password_hash, password)
+
+    # Create A String
+    def __rept__(self):
+        return '<Name %r>' % self.name
+
+
+# Drop a user from the user cache once a change to them has committed
+@event.listens_for(Users, 'after_update')
+@event.listens_for(Users, 'after_delete')
+def _user_changed(mapper, connection, user):
+    object_session(user).info.setdefault('changed_users', set()).add(user.id)
+
+
+@event.listens_for(Session, 'after_commit')
+def _forget_changed_users(session):
+    changed = session.info.pop('changed_users', ())
+    if changed and has_app_context():
+        user_cache = get_cache('user')
+        for user_id in changed:
+            user_cache.delete(user_id)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _keep_cached_users(session):
+    session.info.pop('changed_users', None)
+
+# Create a Blog Post model
+
+
+class Posts(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    title = db.Column(db.String(255))
+    content = db.Column(db.Text)
+    # author = db.Column(db.String(255))
+    date_posted = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+    # The post's URL, /posts/<slug>
+    slug = db.Column(db.String(255), unique=True, index=True)
+    # Foreign Key to Link Users (refer to primary key)
+    poster_id = db.Column(db.Integer, db.ForeignKey('users.id'), index=True)
+    # Bumped on every edit
+    version = db.Column(db.Integer, nullable=False, default=1, server_default='1')
+    date_modified = db.Column(Timestamp, default=datetime.utcnow, onupdate=datetime.utcnow,
+                              index=True)
+    # Worked out from content on every save, see render_content()
+    content_html = db.Column(db.Text)
+    excerpt = db.Column(db.Text)
+    word_count = db.Column(db.Integer)
+    reading_minutes = db.Column(db.Integer)
+
+    def render_content(self, excerpt_length):
+        for key, value in render_post(self.content, excerpt_length).items():
+            setattr(self, key, value)
+
+
+def slug_usage(base, post_id=None):
+    # (whether another post has `base`, the highest n in use among base
+    # (counted as 1) and base-2, base-3...) - one query whatever the count
+    suffix = db.func.substr(Posts.slug, len(base) + 2)
+    number = db.cast(suffix, db.Integer)
+    # Only endings that are all digits count, not base-world or base-2024-recap
+    numeric = db.cast(number, db.String) == suffix
+    query = db.session.query(
+        db.func.max(db.case((Posts.slug == base, 1), else_=0)),
+        db.func.max(db.case((Posts.slug == base, 1), (numeric, number), else_=0)),
+    ).filter(db.or_(Posts.slug == base,
+                    # base-..., as a range so it can use the index ('.' follows '-')
+                    db.and_(Posts.slug > base + '-', Posts.slug < base + '.')))
+    if post_id is not None:
+        query = query.filter(Posts.id != post_id)
+    taken, highest = query.one()
+    return bool(taken), highest or 0
+
+
+def unique_slug(text, post_id=None):
+    # slugify(text), with -2, -3... on the end if another post already has it
+    base = slugify(text)
+    taken, highest = slug_usage(base, post_id)
+    return f'{base}-{max(highest, 1) + 1}' if taken else base
+
+
+# Search index: one row per (term, post)
+
+
+class SearchIndex(db.Model):
+    term = db.Column(db.String(64), primary_key=True)
+    post_id = db.Column(db.Integer, db.ForeignKey('posts.id'), primary_key=True, index=True)
+    weight = db.Column(db.Integer, nullable=False, default=1)
+
+
+search_index = InvertedIndex(db, SearchIndex, Posts)
+
+# How far `flask import` got through each file
+
+
+class ImportProgress(db.Model):
+    source = db.Column(db.String(512), primary_key=True)
+    rows_done = db.Column(db.Integer, nullable=False, default=0)
+    date_modified = db.Column(Timestamp, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+# Background jobs, see jobs.py
+
+
+class Jobs(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(100), nullable=False)
+    # Keyword arguments, as JSON
+    args = db.Column(db.Text, nullable=False, default='{}')
+    # queued, running, done or failed
+    status = db.Column(db.String(20), nullable=False, default='queued')
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    max_attempts = db.Column(db.Integer, nullable=False, default=5)
+    run_at = db.Column(Timestamp, nullable=False, default=datetime.utcnow)
+    # A running job whose worker died is picked up again after this
+    locked_until = db.Column(Timestamp)
+    last_error = db.Column(db.Text)
+    date_added = db.Column(Timestamp, default=datetime.utcnow, index=True)
+    date_finished = db.Column(Timestamp)
+
+    # What a worker looks for: due jobs in a status
+    __table_args__ = (db.Index('ix_jobs_status_run_at', 'status', 'run_at'),)
@@ -0,0 +1,231 @@
+import os
+import sqlite3
+import threading
+import time
+
+from flask import current_app, g, make_response, request, session
+from flask_login import current_user
+from flask_wtf.csrf import generate_csrf
+
+from conditional import stamp_etag
+from replicas import use_primary
+
+# Full page cache
+#
+# With PAGE_CACHE_PATH set, anonymous GETs of the pages below are stored,
+# whole, in a SQLite file every worker on the node shares, and the next
+# anonymous visitor gets them without a query or a template render.
+#
+# A page is fresh for PAGE_CACHE_TTL seconds. After that the first worker
+# to ask takes a short lock and renders it again, while everybody else keeps
+# getting the stale copy (for up to PAGE_CACHE_STALE more seconds), so a
+# popular page expiring doesn't send every worker to the database at once.
+#
+# The navbar's CSRF token is per visitor, so it is stored as a placeholder
+# and filled in with the visitor's own token on the way out. The ETag is
+# per visitor too (see conditional.py): we keep the page's version stamp
+# and work the visitor's ETag out from it, so a cached page still gets a
+# 304 when the visitor already has it.
+
+CACHED_ENDPOINTS = {'pages.index', 'blog.posts', 'blog.post'}
+CSRF_PLACEHOLDER = '\x00csrf-token\x00'
+# Bump when the pages table changes - the file is just a cache, so an old
+# one is emptied and recreated
+SCHEMA_VERSION = 2
+# How long a worker may take to render a page before another one tries
+LOCK_SECONDS = 10
+# How long a cold miss waits for another worker's render before doing its own
+MISS_WAIT = 2.0
+
+
+class PageCache:
+    def __init__(self, path, ttl=60, stale=300, max_bytes=64 * 1024 * 1024):
+        self.path = path
+        self.ttl = ttl
+        self.stale = stale
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._local = threading.local()
+        self._writes = 0
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        conn = self._connect()
+        conn.execute('BEGIN IMMEDIATE')
+        if conn.execute('PRAGMA user_version').fetchone()[0] != SCHEMA_VERSION:
+            conn.execute('DROP TABLE IF EXISTS pages')
+            conn.execute(f'PRAGMA user_version = {SCHEMA_VERSION}')
+        conn.execute('CREATE TABLE IF NOT EXISTS pages ('
+                     'key TEXT PRIMARY KEY, body BLOB, content_type TEXT, size INTEGER, '
+                     'stamp TEXT, last_modified TEXT, '
+                     'expires REAL, accessed REAL, locked_until REAL DEFAULT 0)')
+        conn.execute('CREATE INDEX IF NOT EXISTS ix_pages_accessed ON pages (accessed)')
+        conn.execute('COMMIT')
+
+    def _connect(self):
+        # sqlite3 connections can't be shared between threads
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    def get(self, key, count_miss=True):
+        # Returns (body, content_type, stamp, last_modified, fresh) or None
+        now = time.time()
+        row = self._connect().execute(
+            'SELECT body, content_type, stamp, last_modified, expires, accessed FROM pages '
+            'WHERE key = ? AND body IS NOT NULL', (key,)).fetchone()
+        if row is None or row[4] + self.stale < now:
+            if count_miss:
+                self.misses += 1
+            return None
+        body, content_type, stamp, last_modified, expires, accessed = row
+        if accessed < now - 10:
+            # Keeps eviction roughly LRU without a write on every hit
+            self._connect().execute('UPDATE pages SET accessed = ? WHERE key = ?', (now, key))
+        self.hits += 1
+        return body, content_type, stamp, last_modified, expires > now
+
+    def lock(self, key):
+        # Returns a lock if we get to render the page, None if someone else has it
+        now = time.time()
+        lock = now + LOCK_SECONDS
+        conn = self._connect()
+        conn.execute('INSERT OR IGNORE INTO pages (key, accessed) VALUES (?, ?)', (key, now))
+        updated = conn.execute(
+            'UPDATE pages SET locked_until = ? WHERE key = ? AND locked_until < ?',
+            (lock, key, now)).rowcount
+        return lock if updated else None
+
+    def unlock(self, key, lock):
+        self._connect().execute(
+            'UPDATE pages SET locked_until = 0 WHERE key = ? AND locked_until = ?', (key, lock))
+
+    def set(self, key, lock, body, content_type, stamp=None, last_modified=None):
+        # Only if we still hold the lock. A purge while we were rendering
+        # deletes the row, and then what we rendered may already be out of date.
+        now = time.time()
+        self._connect().execute(
+            'UPDATE pages SET body = ?, content_type = ?, size = ?, stamp = ?, last_modified = ?, '
+            'expires = ?, accessed = ?, locked_until = 0 WHERE key = ? AND locked_until = ?',
+            (body, content_type, len(body), stamp, last_modified, now + self.ttl, now, key,
+             lock))
+        # Trim now and then rather than on every write
+        self._writes += 1
+        if self._writes % 20 == 0:
+            self.evict()
+
+    def evict(self):
+        # Drop the least recently used pages beyond max_bytes
+        self._connect().execute(
+            'DELETE FROM pages WHERE key IN (SELECT key FROM (SELECT key, SUM(size) OVER '
+            '(ORDER BY accessed DESC) AS total FROM pages) WHERE total > ?)', (self.max_bytes,))
+
+    def purge(self, prefix=''):
+        self._connect().execute('DELETE FROM pages WHERE substr(key, 1, ?) = ?',
+                                (len(prefix), prefix))
+
+    def stats(self):
+        return {'hits': self.hits, 'misses': self.misses}
+
+
+def purge_pages(prefix=''):
+    # Call after a write that changes what cached pages show
+    page_cache = current_app.extensions['caches'].get('page')
+    if page_cache is not None:
+        page_cache.purge(prefix)
+
+
+def cacheable():
+    return (request.method == 'GET' and request.endpoint in CACHED_ENDPOINTS
+            and not current_user.is_authenticated and not session.get('_flashes'))
+
+
+def cached_response(cached, state):
+    body, content_type, stamp, last_modified, fresh = cached
+    body = body.decode()
+    if CSRF_PLACEHOLDER in body:
+        body = body.replace(CSRF_PLACEHOLDER, generate_csrf())
+    etag = stamp_etag(stamp) if stamp is not None else None
+    # Like conditional_response: the visitor already has this page
+    if etag is not None and request.if_none_match.contains_weak(etag):
+        response = make_response('', 304)
+    else:
+        response = make_response(body)
+        response.content_type = content_type
+    if etag is not None:
+        response.set_etag(etag, weak=True)
+    if last_modified:
+        response.headers['Last-Modified'] = last_modified
+    response.headers['X-Page-Cache'] = state
+    response.cache_control.private = True
+    response.cache_control.no_cache = True
+    return response
+
+
+def init_page_cache(app):
+    # Call last, so the request profile and metrics also see cache hits
+    if not app.config['PAGE_CACHE_PATH']:
+        return
+    page_cache = PageCache(app.config['PAGE_CACHE_PATH'], ttl=app.config['PAGE_CACHE_TTL'],
+                           stale=app.config['PAGE_CACHE_STALE'],
+                           max_bytes=app.config['PAGE_CACHE_MAX_BYTES'])
+    app.extensions['caches']['page'] = page_cache
+
+    @app.before_request
+    def serve_cached_page():
+        if not cacheable():
+            return None
+        key = request.full_path
+        cached = page_cache.get(key)
+        if cached is not None:
+            if cached[-1]:
+                return cached_response(cached, 'HIT')
+            lock = page_cache.lock(key)
+            if lock is None:
+                # Someone else is already on it
+                return cached_response(cached, 'STALE')
+        else:
+            lock = page_cache.lock(key)
+            if lock is None:
+                # Cold page that another worker is rendering - give it a moment
+                deadline = time.monotonic() + MISS_WAIT
+                while time.monotonic() < deadline:
+                    time.sleep(0.05)
+                    # Already counted as one miss
+                    cached = page_cache.get(key, count_miss=False)
+                    if cached is not None:
+                        return cached_response(cached, 'HIT')
+                return None
+        g.page_cache_lock = key, lock
+        # Other visitors get this copy, so it must not come from a lagging replica
+        use_primary()
+        return None
+
+    @app.after_request
+    def store_page(response):
+        if 'page_cache_lock' not in g:
+            return response
+        key, lock = g.pop('page_cache_lock')
+        if (response.status_code != 200 or response.direct_passthrough
+                or response.mimetype != 'text/html' or session.get('_flashes')):
+            page_cache.unlock(key, lock)
+            return response
+        body = response.get_data(as_text=True)
+        token = g.get('csrf_token')
+        if token:
+            body = body.replace(token, CSRF_PLACEHOLDER)
+        page_cache.set(key, lock, body.encode(), response.content_type, stamp=g.get('page_stamp'),
+                       last_modified=response.headers.get('Last-Modified'))
+        response.headers['X-Page-Cache'] = 'MISS'
+        return response
+
+    @app.teardown_request
+    def unlock_page(exc):
+        # The render failed - let the next request try
+        if 'page_cache_lock' in g:
+            page_cache.unlock(*g.pop('page_cache_lock'))
@@ -0,0 +1,90 @@
+from flask import Blueprint, g, render_template, flash
+from flask_login import current_user
+from werkzeug.local import LocalProxy
+
+from instrumentation import timed
+from passwords import HashingBusy
+from webforms import NamerForm, SearchForm
+
+bp = Blueprint('pages', __name__)
+
+
+@bp.route('/')
+# def index():
+#     return '<h1>Hello World!</h1>'
+def index():
+    first_name = "bob"
+    stuff = "This is <strong>Bold</strong> text"
+    favorite_pizza = ["Pepperoni", "Cheese", 41]
+    return render_template("index.html",
+                           first_name=first_name,
+                           stuff=stuff,
+                           favorite_pizza=favorite_pizza)
+
+
+# Create Name Page
+@bp.route('/name', methods=['GET', 'POST'])
+def name():
+    form = NamerForm()
+    name = None
+    # Validate Form
+    if form.validate_on_submit():
+        name = form.name.data
+        form.name.data = ''
+        flash("Form Submitted Successfully")
+    return render_template('name.html', name=name, form=form)
+
+# Return JSON
+
+
+@bp.route('/date')
+def get_current_date():
+    favorite_pizza = {
+        "John": "Pepperoni",
+        "Mary": "Cheese",
+        "Tim": "Mushroom"
+    }
+    return favorite_pizza
+    # return {"Date": datetime.today()}
+
+
+# Navbar search form. Building it makes a CSRF token (and may write the
+# session), so only do it if the page actually shows the navbar, and only once.
+def get_search_form():
+    if 'search_form' not in g:
+        with timed('csrf'):
+            g.search_form = SearchForm()
+    return g.search_form
+
+
+def get_is_admin():
+    id = 0
+    if current_user.is_authenticated:
+        id = current_user.id
+    return id == 9
+
+
+# Pass Stuff To Navbar (worked out when the template first uses them)
+@bp.app_context_processor
+def base():
+    return dict(form=LocalProxy(get_search_form), is_admin=LocalProxy(get_is_admin))
+
+# Create Custom Error Pages
+
+# Invalid URL
+
+
+@bp.app_errorhandler(404)
+def page_not_found(e):
+    return render_template("error/404.html"), 404
+
+
+# Too many passwords waiting to be hashed
+@bp.app_errorhandler(HashingBusy)
+def hashing_busy(e):
+    return render_template("error/500.html"), 503
+
+
+@bp.app_errorhandler(500)
+def server_error(e):
+    return render_template("error/500.html"), 500
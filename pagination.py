@@ -0,0 +1,76 @@
+import base64
+from datetime import datetime
+from sqlalchemy import and_, or_
+
+
+# Keyset (cursor) pagination
+#
+# Pages are addressed by the (date, id) of the row at the edge of the page
+# instead of an OFFSET, so page 1000 costs the same as page 1.
+
+
+def encode_cursor(date, id):
+    raw = f'{date.isoformat()}|{id}'
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    if not cursor:
+        return None
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        raw = base64.urlsafe_b64decode(padded.encode()).decode()
+        date, id = raw.split('|')
+        return datetime.fromisoformat(date), int(id)
+    except ValueError:
+        # Bad or tampered cursor - start from the first page
+        return None
+
+
+class Page:
+    def __init__(self, items, next_cursor=None, prev_cursor=None):
+        self.items = items
+        self.next_cursor = next_cursor
+        self.prev_cursor = prev_cursor
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def __len__(self):
+        return len(self.items)
+
+
+def keyset_paginate(query, date_col, id_col, per_page, after=None, before=None):
+    after = decode_cursor(after)
+    before = decode_cursor(before) if after is None else None
+
+    if before is not None:
+        # Walk backwards from the cursor, then flip back to display order
+        date, id = before
+        query = query.filter(or_(date_col < date,
+                                 and_(date_col == date, id_col < id)))
+        query = query.order_by(date_col.desc(), id_col.desc())
+    else:
+        if after is not None:
+            date, id = after
+            query = query.filter(or_(date_col > date,
+                                     and_(date_col == date, id_col > id)))
+        query = query.order_by(date_col, id_col)
+
+    # Fetch one extra row to know if there is another page
+    rows = query.limit(per_page + 1).all()
+    has_more = len(rows) > per_page
+    rows = rows[:per_page]
+
+    if before is not None:
+        rows.reverse()
+        has_next, has_prev = True, has_more
+    else:
+        has_next, has_prev = has_more, after is not None
+
+    def cursor_for(row):
+        return encode_cursor(getattr(row, date_col.key), getattr(row, id_col.key))
+
+    next_cursor = cursor_for(rows[-1]) if rows and has_next else None
+    prev_cursor = cursor_for(rows[0]) if rows and has_prev else None
+    return Page(rows, next_cursor=next_cursor, prev_cursor=prev_cursor)
@@ -0,0 +1,104 @@
+import hashlib
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from werkzeug.security import generate_password_hash, check_password_hash
+
+from instrumentation import timed
+
+
+# Password hashing
+#
+# Hashes are worked out in a pool of processes so a burst of logins can't
+# tie up every request thread on CPU. Only `max_pending` hashes may be
+# queued at once; past that we give up early with HashingBusy.
+
+HASH_PREFIX = 'pbkdf2:sha256:'
+# Never go below this, however slow the machine is
+MIN_ITERATIONS = 100000
+# Calibrated counts are rounded to this, so workers timed a little
+# differently still agree
+ITERATIONS_STEP = 100000
+# Hashes this close to the target are left alone, so logins don't keep
+# rewriting hashes whenever a calibration comes out slightly higher
+REHASH_BELOW = 0.8
+
+
+class HashingBusy(Exception):
+    pass
+
+
+def calibrate(target_ms, sample_iterations=20000):
+    # Time a small run and scale it up to the target
+    start = time.perf_counter()
+    hashlib.pbkdf2_hmac('sha256', b'calibrate', b'0123456789abcdef', sample_iterations)
+    elapsed = time.perf_counter() - start
+    iterations = int(sample_iterations * (target_ms / 1000) / max(elapsed, 1e-6))
+    iterations = round(iterations / ITERATIONS_STEP) * ITERATIONS_STEP
+    return max(iterations, MIN_ITERATIONS)
+
+
+class PasswordHasher:
+    def __init__(self, app=None):
+        self.iterations = MIN_ITERATIONS
+        self.workers = 0
+        self.max_pending = 0
+        self.timeout = None
+        self._pool = None
+        self._slots = None
+        self._pool_lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.workers = app.config.get('PASSWORD_HASH_WORKERS', 0)
+        self.max_pending = app.config.get('PASSWORD_HASH_MAX_PENDING', 64)
+        self.timeout = app.config.get('PASSWORD_HASH_TIMEOUT', 5)
+        self.iterations = (app.config.get('PASSWORD_HASH_ITERATIONS')
+                           or calibrate(app.config.get('PASSWORD_HASH_TARGET_MS', 250)))
+        self._slots = threading.BoundedSemaphore(self.max_pending)
+        app.logger.info('Password hashing: pbkdf2:sha256 with %d iterations', self.iterations)
+
+    @property
+    def method(self):
+        return f'{HASH_PREFIX}{self.iterations}'
+
+    def _get_pool(self):
+        # Started on first use, so each gunicorn worker makes its own after the fork
+        with self._pool_lock:
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(max_workers=self.workers)
+            return self._pool
+
+    def _run(self, fn, *args):
+        # Time spent waiting for a worker counts too - the request waited
+        with timed('hashing'):
+            return self._hash(fn, *args)
+
+    def _hash(self, fn, *args):
+        if not self.workers:
+            return fn(*args)
+        if not self._slots.acquire(timeout=self.timeout):
+            raise HashingBusy()
+        try:
+            return self._get_pool().submit(fn, *args).result()
+        finally:
+            self._slots.release()
+
+    def hash(self, password):
+        return self._run(generate_password_hash, password, self.method)
+
+    def verify(self, pwhash, password):
+        if not pwhash:
+            return False
+        return self._run(check_password_hash, pwhash, password)
+
+    def needs_rehash(self, pwhash):
+        # Older hashes (plain sha256, or a lot fewer iterations) get upgraded on login
+        if not pwhash.startswith(HASH_PREFIX):
+            return True
+        try:
+            iterations = int(pwhash.split('$', 1)[0][len(HASH_PREFIX):])
+        except ValueError:
+            return True
+        return iterations < self.iterations * REHASH_BELOW
@@ -0,0 +1,151 @@
+import math
+import os
+import sqlite3
+import threading
+import time
+
+from flask import request
+from werkzeug.exceptions import TooManyRequests
+
+# Rate limiting
+#
+# Token buckets kept in a SQLite file that every worker on the node
+# shares. Each bucket holds up to `capacity` tokens and refills at
+# capacity / period per second; a form submit takes one token, and with
+# none left we answer 429 straight from before_request - before the view
+# has looked anything up or hashed anything.
+#
+# RATE_LIMITS sets the limits per endpoint, each either per client IP or
+# per submitted username:
+#
+#   auth.login=ip:20/60,username:10/60;blog.search=ip:30/60
+#
+# Behind a proxy, make sure request.remote_addr is the client (ProxyFix).
+
+SCOPES = ('ip', 'username')
+# Only form submits cost anything
+LIMITED_METHODS = {'POST'}
+
+
+def parse_limits(text):
+    # 'endpoint=scope:capacity/period,...;...' -> {endpoint: [(scope, capacity, period)]}
+    limits = {}
+    for rule in filter(None, (part.strip() for part in text.split(';'))):
+        endpoint, _, buckets = rule.partition('=')
+        for bucket in buckets.split(','):
+            scope, _, rate = bucket.strip().partition(':')
+            capacity, _, period = rate.partition('/')
+            if scope not in SCOPES:
+                raise ValueError(f'Unknown rate limit scope {scope!r} in {rule!r}')
+            limits.setdefault(endpoint.strip(), []).append((scope, int(capacity), float(period)))
+    return limits
+
+
+class RateLimiter:
+    def __init__(self, path, limits):
+        self.path = path
+        self.limits = limits
+        self.allowed = {}
+        self.rejected = {}
+        self._local = threading.local()
+        self._calls = 0
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._connect().execute('CREATE TABLE IF NOT EXISTS buckets ('
+                                'key TEXT PRIMARY KEY, tokens REAL, updated REAL)')
+
+    def _connect(self):
+        # sqlite3 connections can't be shared between threads
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=1, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    def take(self, key, capacity, period):
+        # Returns 0 if a token was taken, else seconds until there is one
+        now = time.time()
+        rate = capacity / period
+        conn = self._connect()
+        # One statement, so two workers can't both take the last token
+        taken = conn.execute(
+            'INSERT INTO buckets (key, tokens, updated) VALUES (?, ?, ?) '
+            'ON CONFLICT (key) DO UPDATE SET '
+            'tokens = MIN(?, tokens + (excluded.updated - updated) * ?) - 1, '
+            'updated = excluded.updated '
+            'WHERE MIN(?, tokens + (excluded.updated - updated) * ?) >= 1',
+            (key, capacity - 1, now, capacity, rate, capacity, rate)).rowcount
+        self._calls += 1
+        if self._calls % 1000 == 0:
+            self.cleanup()
+        if taken:
+            return 0
+        tokens, updated = conn.execute('SELECT tokens, updated FROM buckets WHERE key = ?',
+                                       (key,)).fetchone()
+        tokens = min(capacity, tokens + (now - updated) * rate)
+        return max(1, math.ceil((1 - tokens) / rate))
+
+    def cleanup(self):
+        # Buckets that have been full for a while are the same as no bucket
+        longest = max((period for buckets in self.limits.values()
+                       for _, _, period in buckets), default=0)
+        self._connect().execute('DELETE FROM buckets WHERE updated < ?', (time.time() - longest,))
+
+    def give_back(self, key, capacity):
+        self._connect().execute('UPDATE buckets SET tokens = MIN(?, tokens + 1) WHERE key = ?',
+                                (capacity, key))
+
+    def check(self, endpoint, ip, username):
+        # Returns seconds to wait, or 0 if the request may go ahead
+        taken = []
+        for scope, capacity, period in self.limits.get(endpoint, []):
+            value = ip if scope == 'ip' else (username or '').strip().lower()
+            if not value:
+                continue
+            name = endpoint, scope
+            key = f'{endpoint}:{scope}:{value}'
+            try:
+                retry_after = self.take(key, capacity, period)
+            except sqlite3.OperationalError:
+                # Locked for too long - better to let it through than to stall
+                continue
+            if retry_after:
+                self.rejected[name] = self.rejected.get(name, 0) + 1
+                # The request won't run, so it mustn't cost the other buckets
+                # anything - one locked out username would drain its whole IP
+                for taken_key, taken_capacity, _ in taken:
+                    try:
+                        self.give_back(taken_key, taken_capacity)
+                    except sqlite3.OperationalError:
+                        pass
+                return retry_after
+            taken.append((key, capacity, name))
+        for _, _, name in taken:
+            self.allowed[name] = self.allowed.get(name, 0) + 1
+        return 0
+
+    def stats(self):
+        # {(endpoint, scope): {'allowed': n, 'rejected': n}} for this worker
+        names = sorted(set(self.allowed) | set(self.rejected))
+        return {name: {'allowed': self.allowed.get(name, 0),
+                       'rejected': self.rejected.get(name, 0)} for name in names}
+
+
+def init_rate_limits(app):
+    limits = parse_limits(app.config['RATE_LIMITS'])
+    if not limits:
+        return
+    path = app.config['RATE_LIMIT_PATH'] or os.path.join(app.instance_path, 'ratelimit.db')
+    limiter = RateLimiter(path, limits)
+    app.extensions['rate_limiter'] = limiter
+
+    @app.before_request
+    def rate_limit():
+        if request.method not in LIMITED_METHODS or request.endpoint not in limiter.limits:
+            return
+        wait = limiter.check(request.endpoint, request.remote_addr, request.form.get('username'))
+        if wait:
+            raise TooManyRequests(retry_after=wait)
@@ -0,0 +1,105 @@
+import os
+import random
+import sqlite3
+import time
+from functools import wraps
+
+import click
+from flask import current_app, g, has_request_context, session
+from flask.cli import AppGroup
+from flask_sqlalchemy.session import Session
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+
+# Read replicas
+#
+# With REPLICA_URIS set, views marked @use_replica read from one of the
+# replicas (the same one for the whole request). Writes, and every read
+# after a write in the same request, go to the primary. A write also pins
+# the client to the primary for REPLICA_PIN_SECONDS (in its session
+# cookie), so the page it's redirected to shows the change even when the
+# replicas are behind.
+#
+# Locally, point REPLICA_URIS at SQLite files and copy the primary into
+# them with `flask replicas sync`.
+
+REPLICA_PREFIX = 'replica'
+
+replicas_group = AppGroup('replicas', help='Read replica helpers.')
+
+
+def replica_binds(config):
+    return {f'{REPLICA_PREFIX}{i}': uri for i, uri in enumerate(config['REPLICA_URIS'])}
+
+
+def use_replica(view):
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        g.use_replica = True
+        return view(*args, **kwargs)
+    return wrapper
+
+
+def use_primary():
+    # For a read that has to be current, e.g. a check just before a write
+    g.use_primary = True
+
+
+def pinned_to_primary():
+    return (g.get('use_primary') or not g.get('use_replica')
+            or session.get('primary_until', 0) > time.time())
+
+
+class RoutingSession(Session):
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and not self._flushing and has_request_context() \
+                and not pinned_to_primary():
+            if 'replica_key' not in g:
+                keys = [key for key in self._db.engines
+                        if key and key.startswith(REPLICA_PREFIX)]
+                g.replica_key = random.choice(keys) if keys else None
+            if g.replica_key is not None:
+                return self._db.engines[g.replica_key]
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+@event.listens_for(RoutingSession, 'after_flush')
+def pin_after_write(db_session, flush_context):
+    if has_request_context() and current_app.config['REPLICA_URIS']:
+        g.use_primary = True
+        session['primary_until'] = time.time() + current_app.config['REPLICA_PIN_SECONDS']
+
+
+def sqlite_path(uri):
+    url = make_url(uri)
+    if url.get_backend_name() != 'sqlite' or not url.database:
+        raise click.ClickException(f'{uri} is not a SQLite file - use real replication')
+    # Flask-SQLAlchemy puts relative paths in the instance folder
+    return os.path.join(current_app.instance_path, url.database)
+
+
+@replicas_group.command('sync')
+@click.option('--interval', type=float,
+              help='Keep copying every this many seconds, like replication with that much lag.')
+def sync(interval):
+    """Copy a SQLite primary into SQLite replicas."""
+    primary = sqlite_path(current_app.config['SQLALCHEMY_DATABASE_URI'])
+    replicas = [sqlite_path(uri) for uri in current_app.config['REPLICA_URIS']]
+    if not replicas:
+        raise click.ClickException('REPLICA_URIS is empty')
+    while True:
+        source = sqlite3.connect(primary)
+        try:
+            for path in replicas:
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                target = sqlite3.connect(path)
+                try:
+                    source.backup(target)
+                finally:
+                    target.close()
+        finally:
+            source.close()
+        click.echo(f'Copied {primary} to {len(replicas)} replicas')
+        if not interval:
+            return
+        time.sleep(interval)
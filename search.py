@@ -0,0 +1,113 @@
+import re
+from collections import Counter
+from html.parser import HTMLParser
+from sqlalchemy import func
+
+
+# Full text search
+#
+# Posts are split into terms when they are saved, and each (term, post)
+# pair is stored as a row in an index table. A search only reads the rows
+# for the searched terms, so it never scans the posts table.
+
+TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+STOP_WORDS = {'a', 'an', 'and', 'are', 'as', 'at', 'be', 'by', 'for', 'from', 'in',
+              'is', 'it', 'of', 'on', 'or', 'that', 'the', 'this', 'to', 'was', 'with'}
+MAX_TERM_LENGTH = 64
+
+# How much a match in each field counts towards the rank
+TITLE_WEIGHT = 5
+SLUG_WEIGHT = 3
+CONTENT_WEIGHT = 1
+
+
+class _TextExtractor(HTMLParser):
+    def __init__(self):
+        super().__init__()
+        self.parts = []
+
+    def handle_data(self, data):
+        self.parts.append(data)
+
+
+def html_to_text(html):
+    # CKEditor content is stored as HTML - only index what a reader sees
+    extractor = _TextExtractor()
+    extractor.feed(html or '')
+    extractor.close()
+    return ' '.join(extractor.parts)
+
+
+def tokenize(text):
+    terms = []
+    for token in TOKEN_RE.findall((text or '').lower()):
+        if token in STOP_WORDS or len(token) > MAX_TERM_LENGTH:
+            continue
+        terms.append(token)
+    return terms
+
+
+def post_terms(post):
+    weights = Counter()
+    for term in tokenize(post.title):
+        weights[term] += TITLE_WEIGHT
+    # Slugs are usually hyphenated, \w+ splits them into words
+    for term in tokenize(post.slug):
+        weights[term] += SLUG_WEIGHT
+    for term in tokenize(html_to_text(post.content)):
+        weights[term] += CONTENT_WEIGHT
+    return weights
+
+
+class InvertedIndex:
+    def __init__(self, db, index_model, post_model):
+        self.db = db
+        self.index_model = index_model
+        self.post_model = post_model
+
+    def index_post(self, post):
+        # Replace whatever was indexed for this post before. Runs in the
+        # caller's transaction, so the post and its terms commit together.
+        self.remove_post(post.id)
+        self.db.session.add_all([
+            self.index_model(term=term, post_id=post.id, weight=weight)
+            for term, weight in post_terms(post).items()
+        ])
+
+    def remove_post(self, post_id):
+        self.index_model.query.filter_by(post_id=post_id).delete()
+
+    def rebuild(self, batch_size=500):
+        self.index_model.query.delete()
+        count = 0
+        for post in self.post_model.query.yield_per(batch_size):
+            self.index_post(post)
+            count += 1
+        self.db.session.commit()
+        return count
+
+    def search(self, text, limit=50, options=None):
+        # Every term has to match (AND). Best matches first.
+        terms = set(tokenize(text))
+        if not terms:
+            return []
+        Index = self.index_model
+        rank = func.sum(Index.weight).label('rank')
+        matches = (self.db.session.query(Index.post_id, rank)
+                   .filter(Index.term.in_(terms))
+                   .group_by(Index.post_id)
+                   .having(func.count(Index.term) == len(terms))
+                   .order_by(rank.desc(), Index.post_id.desc())
+                   .limit(limit)
+                   .all())
+        if not matches:
+            return []
+        ids = [post_id for post_id, _ in matches]
+        if options is None:
+            options = [self.db.joinedload(self.post_model.poster)]
+        posts = (self.post_model.query
+                 .options(*options)
+                 .filter(self.post_model.id.in_(ids))
+                 .all())
+        by_id = {post.id: post for post in posts}
+        return [by_id[post_id] for post_id in ids if post_id in by_id]
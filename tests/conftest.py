@@ -0,0 +1,64 @@
+import os
+import sys
+
+import pytest
+
+# The app's modules live at the top of the repo
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# How many posts the posts fixture makes
+POSTS = 30
+
+
+@pytest.fixture
+def app_config():
+    # Override in a test module for settings create_app needs up front
+    return {}
+
+
+@pytest.fixture
+def app(tmp_path, app_config):
+    from app import create_app
+    from extensions import db
+
+    app = create_app({
+        'TESTING': True,
+        'SECRET_KEY': 'test',
+        'SQLALCHEMY_DATABASE_URI': f'sqlite:///{tmp_path}/test.db',
+        'WTF_CSRF_ENABLED': False,
+        'PASSWORD_HASH_WORKERS': 0,
+        'PASSWORD_HASH_ITERATIONS': 1000,
+        'METRICS_PATH': str(tmp_path / 'metrics.db'),
+        'RATE_LIMITS': '',
+        'JOBS_INLINE': True,
+        **app_config,
+    })
+    with app.app_context():
+        db.create_all()
+    yield app
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def posts(app):
+    # POSTS posts, each by a different user, with slugs flask-post-<n>
+    from extensions import db
+    from models import Posts, Users, search_index
+
+    with app.app_context():
+        users = [Users(username=f'user{i}', name=f'User {i}', email=f'user{i}@example.com')
+                 for i in range(POSTS)]
+        db.session.add_all(users)
+        db.session.flush()
+        for i, user in enumerate(users):
+            post = Posts(title=f'Flask post {i}', content=f'<p>Flask post number {i}</p>',
+                         slug=f'flask-post-{i}', poster_id=user.id)
+            post.render_content(app.config['POST_EXCERPT_LENGTH'])
+            db.session.add(post)
+        db.session.commit()
+        search_index.rebuild()
+        db.session.commit()
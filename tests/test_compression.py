@@ -0,0 +1,59 @@
+import gzip
+
+import pytest
+
+from compression import CompressionMiddleware
+
+
+def make_app(body, content_type='text/html; charset=utf-8'):
+    def app(environ, start_response):
+        start_response('200 OK', [('Content-Type', content_type),
+                                  ('Content-Length', str(len(body))), ('ETag', '"abc"')])
+        # Like werkzeug: HEAD gets the GET headers and no body
+        return [] if environ['REQUEST_METHOD'] == 'HEAD' else [body]
+    return CompressionMiddleware(app, min_size=100)
+
+
+def call(app, method='GET', accept='gzip'):
+    environ = {'REQUEST_METHOD': method, 'HTTP_ACCEPT_ENCODING': accept}
+    captured = {}
+
+    def start_response(status, headers, exc_info=None):
+        captured['status'] = status
+        captured['headers'] = dict(headers)
+
+    body = b''.join(app(environ, start_response))
+    return captured['headers'], body
+
+
+def test_gzips_large_bodies():
+    page = b'<p>hello</p>' * 100
+    headers, body = call(make_app(page))
+    assert headers['Content-Encoding'] == 'gzip'
+    assert headers['Vary'] == 'Accept-Encoding'
+    assert headers['ETag'] == 'W/"abc"'
+    assert 'Content-Length' not in headers
+    assert gzip.decompress(body) == page
+
+
+def test_head_gets_the_get_headers():
+    app = make_app(b'<p>hello</p>' * 100)
+    get_headers, _ = call(app)
+    head_headers, body = call(app, method='HEAD')
+    assert body == b''
+    assert head_headers == get_headers
+
+
+@pytest.mark.parametrize('body, accept', [(b'tiny', 'gzip'), (b'<p>hello</p>' * 100, '')],
+                         ids=['small', 'not-accepted'])
+def test_uncompressed_text_still_varies(body, accept):
+    headers, sent = call(make_app(body), accept=accept)
+    assert 'Content-Encoding' not in headers
+    assert headers['Vary'] == 'Accept-Encoding'
+    assert sent == body
+
+
+def test_skipped_types_left_alone():
+    headers, _ = call(make_app(b'\x89PNG' * 200, content_type='image/png'))
+    assert 'Content-Encoding' not in headers
+    assert 'Vary' not in headers
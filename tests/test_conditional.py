@@ -0,0 +1,35 @@
+import pytest
+
+from extensions import db
+from models import Posts, Users
+
+
+@pytest.fixture
+def post(app):
+    # The navbar's search form carries a CSRF token, which is part of the ETag
+    app.config['WTF_CSRF_ENABLED'] = True
+    with app.app_context():
+        user = Users(username='poster', name='Poster', email='poster@example.com')
+        db.session.add(user)
+        db.session.flush()
+        post = Posts(title='Conditional', content='<p>Conditional GET</p>', slug='conditional',
+                     poster_id=user.id)
+        post.render_content(app.config['POST_EXCERPT_LENGTH'])
+        db.session.add(post)
+        db.session.commit()
+
+
+@pytest.mark.parametrize('path', ['/posts', '/posts/conditional'])
+def test_first_visit_revalidates(client, post, path):
+    # The first render creates the visitor's CSRF token; the ETag they get
+    # must already be the one their next request works out
+    response = client.get(path)
+    assert response.status_code == 200
+    etag = response.headers['ETag']
+    assert client.get(path, headers={'If-None-Match': etag}).status_code == 304
+
+
+def test_etag_is_per_visitor(app, client, post):
+    etag = client.get('/posts/conditional').headers['ETag']
+    other = app.test_client()
+    assert other.get('/posts/conditional', headers={'If-None-Match': etag}).status_code == 200
@@ -0,0 +1,59 @@
+import pytest
+
+from content import sanitize
+
+
+def clean(html):
+    return sanitize(html)[0]
+
+
+@pytest.mark.parametrize('url', [
+    'javascript:alert(1)',
+    ' JavaScript:alert(1)',
+    'jav&#x09;ascript:alert(1)',
+    'data:text/html;base64,PHNjcmlwdD5hbGVydCgxKTwvc2NyaXB0Pg==',
+    'vbscript:msgbox(1)',
+])
+def test_dangerous_urls_are_dropped(url):
+    assert clean(f'<a href="{url}">x</a>') == '<a rel="nofollow noopener">x</a>'
+    assert clean(f'<img src="{url}">') == '<img>'
+
+
+def test_safe_urls_are_kept():
+    assert clean('<a href="https://example.com/?a=1&b=2">x</a>') == \
+        '<a href="https://example.com/?a=1&amp;b=2" rel="nofollow noopener">x</a>'
+    assert clean('<a href="/posts/hello">x</a>') == '<a href="/posts/hello" rel="nofollow noopener">x</a>'
+
+
+def test_malformed_urls_are_dropped():
+    assert clean('<a href="http://[::1">x</a>') == '<a rel="nofollow noopener">x</a>'
+    assert clean('<img src="http://[bad">') == '<img>'
+
+
+def test_event_handlers_and_unknown_attributes_are_dropped():
+    assert clean('<p onclick="alert(1)" style="color:red">x</p>') == '<p>x</p>'
+    assert clean('<img src="a.png" onerror="alert(1)">') == '<img src="a.png">'
+
+
+def test_script_and_style_are_removed_with_their_contents():
+    html, text = sanitize('<p>a<script>alert(1)</script>b<style>p{}</style>c</p>')
+    assert html == '<p>abc</p>'
+    assert 'alert' not in text
+
+
+def test_unknown_tags_keep_their_text():
+    assert clean('<form><input value="x">hi</form>') == 'hi'
+
+
+def test_unclosed_tags_are_closed():
+    assert clean('<div><p><strong>x') == '<div><p><strong>x</strong></p></div>'
+    assert clean('<ul><li>a</ul>') == '<ul><li>a</li></ul>'
+
+
+def test_stray_end_tags_are_ignored():
+    assert clean('</p>x</div>') == 'x'
+
+
+def test_text_is_escaped():
+    assert clean('<p>1 &lt; 2 &amp; <b>"3"</b></p>') == '<p>1 &lt; 2 &amp; <b>"3"</b></p>'
+    assert clean('&lt;script&gt;') == '&lt;script&gt;'
@@ -0,0 +1,97 @@
+import json
+
+import pytest
+
+from extensions import db
+from models import Posts, Users
+
+
+@pytest.fixture
+def author(app):
+    with app.app_context():
+        user = Users(username='alice', name='Alice', email='alice@example.com')
+        db.session.add(user)
+        db.session.commit()
+        return user.id
+
+
+def write_jsonl(path, rows):
+    path.write_text(''.join(json.dumps(row) + '\n' for row in rows))
+    return str(path)
+
+
+def import_posts(app, tmp_path, slugs, author, batch_size=1000, name='posts.jsonl'):
+    rows = [{'title': f'Post {i}', 'content': '<p>x</p>', 'slug': slug, 'poster_id': author}
+            for i, slug in enumerate(slugs)]
+    path = write_jsonl(tmp_path / name, rows)
+    result = app.test_cli_runner().invoke(
+        args=['import', 'posts', path, '--batch-size', str(batch_size), '--no-index'])
+    assert result.exit_code == 0, result.output
+    with app.app_context():
+        return [slug for (slug,) in db.session.query(Posts.slug).order_by(Posts.id)]
+
+
+def test_repeated_slugs_are_numbered(app, tmp_path, author):
+    assert import_posts(app, tmp_path, ['hello', 'hello', 'Hello!'], author) == \
+        ['hello', 'hello-2', 'hello-3']
+
+
+def test_numbered_slug_clashing_with_an_explicit_one_in_the_batch(app, tmp_path, author):
+    assert import_posts(app, tmp_path, ['hello', 'hello', 'hello-2'], author) == \
+        ['hello', 'hello-2', 'hello-2-2']
+
+
+def test_numbered_slug_clashing_across_batches(app, tmp_path, author):
+    # hello-2 is handed out in the first batch, then comes explicitly in the second
+    slugs = import_posts(app, tmp_path, ['hello', 'hello', 'hello-2', 'hello'], author,
+                         batch_size=2)
+    assert slugs == ['hello', 'hello-2', 'hello-2-2', 'hello-3']
+
+
+def test_explicit_slug_in_a_later_batch_is_not_handed_out_again(app, tmp_path, author):
+    # hello-2 arrives explicitly before the second hello needs a number
+    slugs = import_posts(app, tmp_path, ['hello', 'other', 'hello-2', 'hello'], author,
+                         batch_size=2)
+    assert slugs == ['hello', 'other', 'hello-2', 'hello-3']
+
+
+def test_numbers_continue_from_the_database(app, tmp_path, author):
+    import_posts(app, tmp_path, ['hello', 'hello-5', 'hello-world'], author, name='first.jsonl')
+    slugs = import_posts(app, tmp_path, ['hello', 'hello-world'], author, name='second.jsonl')
+    assert slugs[3:] == ['hello-6', 'hello-world-2']
+
+
+def test_resume_after_a_failed_batch(app, tmp_path, author):
+    rows = [{'title': f'Post {i}', 'content': '<p>x</p>', 'poster_id': author}
+            for i in range(5)]
+    rows[3]['date_posted'] = 'not a date'
+    path = write_jsonl(tmp_path / 'posts.jsonl', rows)
+    args = ['import', 'posts', path, '--batch-size', '2', '--no-index']
+    result = app.test_cli_runner().invoke(args=args)
+    assert result.exit_code != 0
+    with app.app_context():
+        assert db.session.query(Posts.title).count() == 2
+
+    del rows[3]['date_posted']
+    write_jsonl(tmp_path / 'posts.jsonl', rows)
+    result = app.test_cli_runner().invoke(args=args)
+    assert result.exit_code == 0, result.output
+    assert 'Resuming posts after 2 rows' in result.output
+    with app.app_context():
+        titles = [title for (title,) in db.session.query(Posts.title).order_by(Posts.id)]
+    assert titles == [f'Post {i}' for i in range(5)]
+
+
+def test_stdin_keeps_no_checkpoint(app, author):
+    rows = ''.join(json.dumps({'title': f'Post {i}', 'content': '<p>x</p>', 'poster_id': author})
+                   + '\n' for i in range(3))
+    runner = app.test_cli_runner()
+    for _ in range(2):
+        result = runner.invoke(args=['import', 'posts', '-', '--no-index'], input=rows)
+        assert result.exit_code == 0, result.output
+    with app.app_context():
+        assert db.session.query(Posts.title).count() == 6
+
+    result = runner.invoke(args=['import', 'posts', '-', '--resume'], input=rows)
+    assert result.exit_code == 2
+    assert "Can't resume an import from stdin" in result.output
@@ -0,0 +1,48 @@
+import threading
+
+import jobs
+from extensions import db
+from jobs import enqueue, job
+
+calls = []
+
+
+@job('test_record')
+def record(value):
+    calls.append(value)
+
+
+def test_inline_job_runs_after_the_commit(app):
+    calls.clear()
+    with app.app_context():
+        enqueue('test_record', value=1)
+        assert calls == []
+        db.session.commit()
+        # Not inside the caller's save either - at the end of the context
+        assert calls == []
+    assert calls == [1]
+
+
+def test_inline_job_is_dropped_on_rollback(app):
+    calls.clear()
+    with app.app_context():
+        enqueue('test_record', value=1)
+        db.session.rollback()
+        db.session.commit()
+    assert calls == []
+
+
+def test_worker_thread_survives_errors(app, monkeypatch):
+    stop = threading.Event()
+    attempts = []
+
+    def claim():
+        attempts.append(1)
+        if len(attempts) == 1:
+            raise RuntimeError('database went away')
+        stop.set()
+
+    monkeypatch.setattr(jobs, 'claim', claim)
+    monkeypatch.setattr(jobs, 'ERROR_WAIT', 0)
+    jobs.work(app, poll=0, stop=stop)
+    assert len(attempts) == 2
@@ -0,0 +1,78 @@
+import pytest
+
+from extensions import db
+from models import Posts, Users
+
+
+@pytest.fixture
+def app_config(tmp_path):
+    return {'PAGE_CACHE_PATH': str(tmp_path / 'pages.db')}
+
+
+@pytest.fixture
+def post(app):
+    with app.app_context():
+        user = Users(username='alice', name='Alice', email='alice@example.com')
+        user.password = 'secret'
+        db.session.add(user)
+        db.session.flush()
+        post = Posts(title='Cached post', content='<p>Cached</p>', slug='cached-post',
+                     poster_id=user.id)
+        post.render_content(app.config['POST_EXCERPT_LENGTH'])
+        db.session.add(post)
+        db.session.commit()
+        return post.id
+
+
+@pytest.fixture
+def author(app, post):
+    # Logged in, so never served from the page cache
+    author = app.test_client()
+    author.post('/login', data={'username': 'alice', 'password': 'secret'})
+    return author
+
+
+def cache_state(client, path):
+    response = client.get(path)
+    return response.status_code, response.headers.get('X-Page-Cache')
+
+
+@pytest.mark.parametrize('path', ['/posts', '/posts/cached-post'])
+def test_anonymous_pages_are_cached(client, post, path):
+    assert cache_state(client, path) == (200, 'MISS')
+    assert cache_state(client, path) == (200, 'HIT')
+    # The page is shared, the visitor's session isn't
+    assert cache_state(client.application.test_client(), path) == (200, 'HIT')
+
+
+def test_logged_in_pages_are_not_cached(client, author):
+    assert cache_state(author, '/posts') == (200, None)
+    assert cache_state(client, '/posts') == (200, 'MISS')
+
+
+def test_edit_purges_the_pages(client, author, post):
+    assert cache_state(client, '/posts') == (200, 'MISS')
+    assert cache_state(client, '/posts/cached-post') == (200, 'MISS')
+
+    author.post(f'/posts/edit/{post}', data={'title': 'Edited post', 'slug': 'edited-post',
+                                             'content': '<p>Edited</p>'})
+
+    response = client.get('/posts')
+    assert response.headers['X-Page-Cache'] == 'MISS'
+    assert 'Edited post' in response.get_data(as_text=True)
+    assert 'Cached post' not in response.get_data(as_text=True)
+    # Renamed: the old slug's cached page goes too
+    assert cache_state(client, '/posts/cached-post') == (404, None)
+    assert cache_state(client, '/posts/edited-post') == (200, 'MISS')
+
+
+def test_profile_change_purges_the_pages(client, author, post):
+    assert cache_state(client, '/posts/cached-post') == (200, 'MISS')
+
+    author.post('/dashboard', data={'name': 'Alice Renamed', 'email': 'alice@example.com',
+                                    'favorite_color': '', 'username': 'alice',
+                                    'about_author': ''})
+
+    response = client.get('/posts/cached-post')
+    assert response.headers['X-Page-Cache'] == 'MISS'
+    assert 'Alice Renamed' in response.get_data(as_text=True)
@@ -0,0 +1,77 @@
+import re
+from datetime import datetime
+
+import pytest
+
+from conftest import POSTS
+from extensions import db
+from models import Posts
+from pagination import decode_cursor, encode_cursor
+
+PER_PAGE = 7
+
+
+@pytest.fixture
+def app_config():
+    return {'POSTS_PER_PAGE': PER_PAGE}
+
+
+def read_page(client, url):
+    response = client.get(url)
+    assert response.status_code == 200
+    html = response.get_data(as_text=True)
+    slugs = re.findall(r'/posts/(flask-post-\d+)', html)
+    links = {direction: f'/posts?{direction}={cursor}' for direction, cursor
+             in re.findall(r'/posts\?(after|before)=([\w-]+)', html)}
+    # Each post is linked from its title and its "read more"
+    return list(dict.fromkeys(slugs)), links
+
+
+def walk(client):
+    pages = []
+    url = '/posts'
+    while url:
+        slugs, links = read_page(client, url)
+        pages.append(slugs)
+        url = links.get('after')
+    return pages
+
+
+def test_next_links_cover_every_post_once(client, posts):
+    pages = walk(client)
+    assert [len(page) for page in pages] == [7, 7, 7, 7, 2]
+    seen = [slug for page in pages for slug in page]
+    assert seen == [f'flask-post-{i}' for i in range(POSTS)]
+
+
+def test_previous_goes_back_a_page(client, posts):
+    first, links = read_page(client, '/posts')
+    assert 'before' not in links
+    second, links = read_page(client, links['after'])
+    third, links = read_page(client, links['after'])
+    back, links = read_page(client, links['before'])
+    assert back == second
+    back, links = read_page(client, links['before'])
+    assert back == first
+    assert 'before' not in links
+
+
+def test_posts_with_the_same_date(app, client, posts):
+    # The id breaks ties, so nothing is skipped or repeated at a page edge
+    with app.app_context():
+        db.session.execute(db.update(Posts).values(date_posted=datetime(2026, 1, 1)))
+        db.session.commit()
+    seen = [slug for page in walk(client) for slug in page]
+    assert seen == [f'flask-post-{i}' for i in range(POSTS)]
+
+
+def test_cursor_round_trip():
+    date = datetime(2026, 10, 18, 12, 30, 5, 123456)
+    assert decode_cursor(encode_cursor(date, 42)) == (date, 42)
+
+
+@pytest.mark.parametrize('cursor', ['', 'not-a-cursor',
+                                    encode_cursor(datetime(2026, 1, 1), 1)[:-3]])
+def test_bad_cursor_is_the_first_page(client, posts, cursor):
+    first, _ = read_page(client, '/posts')
+    assert read_page(client, f'/posts?after={cursor}')[0] == first
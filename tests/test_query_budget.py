@@ -0,0 +1,37 @@
+import re
+
+from conftest import POSTS
+from instrumentation import query_budget
+
+# Queries each page may run, however many posts it lists. Loading each
+# post's author separately (an N+1) blows straight through these.
+BUDGETS = {
+    'posts': 2,
+    'post': 2,
+    'search': 2,
+}
+
+
+def post_links(response):
+    return set(re.findall(r'/posts/flask-post-\d+', response.get_data(as_text=True)))
+
+
+def test_posts_page(app, client, posts):
+    with query_budget(BUDGETS['posts']):
+        response = client.get('/posts')
+    assert response.status_code == 200
+    assert len(post_links(response)) == app.config['POSTS_PER_PAGE']
+
+
+def test_post_page(client, posts):
+    with query_budget(BUDGETS['post']):
+        response = client.get('/posts/flask-post-3')
+    assert response.status_code == 200
+    assert 'Flask post 3' in response.get_data(as_text=True)
+
+
+def test_search(client, posts):
+    with query_budget(BUDGETS['search']):
+        response = client.post('/search', data={'searched': 'flask post'})
+    assert response.status_code == 200
+    assert len(post_links(response)) == POSTS
@@ -0,0 +1,50 @@
+import pytest
+
+from ratelimit import RateLimiter, parse_limits
+
+
+def test_parse_limits():
+    assert parse_limits(' auth.login = ip:20/60 , username:10/30.5 ; blog.search=ip:5/1;') == {
+        'auth.login': [('ip', 20, 60.0), ('username', 10, 30.5)],
+        'blog.search': [('ip', 5, 1.0)],
+    }
+
+
+def test_parse_limits_empty_turns_limiting_off():
+    assert parse_limits('') == {}
+    assert parse_limits(' ; ') == {}
+
+
+@pytest.mark.parametrize('text', ['auth.login=session:5/60', 'auth.login=ip:five/60',
+                                  'auth.login=ip:5'])
+def test_parse_limits_rejects_bad_rules(text):
+    with pytest.raises(ValueError):
+        parse_limits(text)
+
+
+@pytest.fixture
+def limiter(tmp_path):
+    return RateLimiter(str(tmp_path / 'ratelimit.db'),
+                       parse_limits('auth.login=ip:5/60,username:2/60'))
+
+
+def test_bucket_runs_out_and_says_how_long_to_wait(limiter):
+    assert limiter.check('auth.login', '10.0.0.1', 'alice') == 0
+    assert limiter.check('auth.login', '10.0.0.1', 'alice') == 0
+    assert limiter.check('auth.login', '10.0.0.1', 'alice') == 30
+
+
+def test_other_endpoints_are_not_limited(limiter):
+    for _ in range(10):
+        assert limiter.check('blog.posts', '10.0.0.1', None) == 0
+
+
+def test_username_lockout_does_not_drain_the_ip(limiter):
+    for _ in range(6):
+        limiter.check('auth.login', '10.0.0.1', 'alice')
+    stats = limiter.stats()
+    assert stats['auth.login', 'username'] == {'allowed': 2, 'rejected': 4}
+    assert stats['auth.login', 'ip'] == {'allowed': 2, 'rejected': 0}
+    # The IP still has 3 of its 5 tokens for everybody else behind it
+    assert [limiter.check('auth.login', '10.0.0.1', f'user{i}') for i in range(4)] == \
+        [0, 0, 0, 12]
@@ -0,0 +1,50 @@
+from extensions import db, get_cache
+from models import Posts
+
+
+def post_id(app, slug):
+    with app.app_context():
+        return db.session.query(Posts.id).filter_by(slug=slug).scalar()
+
+
+def test_old_id_links_move_permanently(app, client, posts):
+    response = client.get(f'/posts/{post_id(app, "flask-post-3")}')
+    assert response.status_code == 301
+    assert response.headers['Location'].endswith('/posts/flask-post-3')
+    assert 'Flask post 3' in client.get(response.headers['Location']).get_data(as_text=True)
+
+
+def test_unknown_id_or_slug(client, posts):
+    assert client.get('/posts/9999').status_code == 404
+    assert client.get('/posts/no-such-post').status_code == 404
+
+
+def test_renamed_post(app, client, posts):
+    id = post_id(app, 'flask-post-3')
+    # Puts flask-post-3 in the slug cache
+    assert client.get('/posts/flask-post-3').status_code == 200
+    with app.app_context():
+        # Another worker renames it, so this worker's slug cache is stale
+        db.session.execute(db.update(Posts).filter_by(id=id).values(slug='renamed'))
+        db.session.commit()
+
+    assert client.get('/posts/flask-post-3').status_code == 404
+    assert client.get('/posts/renamed').status_code == 200
+    response = client.get(f'/posts/{id}')
+    assert response.headers['Location'].endswith('/posts/renamed')
+    with app.app_context():
+        assert get_cache('slug').get('flask-post-3') is None
+
+
+def test_slug_taken_over_by_another_post(app, client, posts):
+    assert client.get('/posts/flask-post-3').status_code == 200
+    with app.app_context():
+        # flask-post-3 is renamed and flask-post-4 takes its old slug
+        db.session.execute(db.update(Posts).filter_by(slug='flask-post-3').values(slug='old'))
+        db.session.execute(db.update(Posts).filter_by(slug='flask-post-4')
+                           .values(slug='flask-post-3'))
+        db.session.commit()
+
+    response = client.get('/posts/flask-post-3')
+    assert response.status_code == 200
+    assert 'Flask post 4' in response.get_data(as_text=True)
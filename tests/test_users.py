@@ -0,0 +1,46 @@
+import pytest
+
+from extensions import db, get_cache
+from models import Users
+
+
+@pytest.fixture
+def user(app):
+    with app.app_context():
+        user = Users(username='alice', name='Alice', email='alice@example.com')
+        user.password = 'secret'
+        db.session.add(user)
+        db.session.commit()
+        return user.id
+
+
+@pytest.fixture
+def logged_in(client, user):
+    client.post('/login', data={'username': 'alice', 'password': 'secret'})
+    return client
+
+
+def profile(**changes):
+    data = {'name': 'Alice', 'email': 'alice@example.com', 'favorite_color': '',
+            'username': 'alice', 'about_author': ''}
+    data.update(changes)
+    return data
+
+
+def test_profile_update_bumps_the_stored_version(app, logged_in, user):
+    # Puts the user in this worker's user cache
+    assert logged_in.get('/dashboard').status_code == 200
+    with app.app_context():
+        assert get_cache('user').get(user) is not None
+        # Another worker saves the profile meanwhile
+        db.session.execute(db.update(Users).values(version=Users.version + 1))
+        db.session.commit()
+
+    logged_in.post('/dashboard', data=profile(about_author='Hello'))
+
+    with app.app_context():
+        saved = db.session.get(Users, user)
+        assert saved.version == 3
+        assert saved.about_author == 'Hello'
+        # Dropped on commit, so the next page loads the new row
+        assert get_cache('user').get(user) is None
@@ -0,0 +1,161 @@
+from flask import Blueprint, render_template, flash, request, redirect, url_for
+from flask_login import login_required, current_user
+
+from extensions import db, hasher
+from models import Users, get_user_for_update
+from pagecache import purge_pages
+from replicas import use_replica, use_primary
+from webforms import UserForm, PasswordForm
+
+bp = Blueprint('users', __name__)
+
+# Create Dashboard Page
+
+
+@bp.route('/dashboard', methods=['GET', 'POST'])
+@login_required
+def dashboard():
+    form = UserForm()
+    id = current_user.id
+    name_to_update = get_user_for_update(id)
+    if request.method == 'POST':
+        name_to_update.name = request.form['name']
+        name_to_update.email = request.form['email']
+        name_to_update.favorite_color = request.form['favorite_color']
+        name_to_update.username = request.form['username']
+        name_to_update.about_author = request.form['about_author']
+        name_to_update.bump_version()
+        try:
+            db.session.commit()
+            # Author names and bios show on post pages
+            purge_pages('/posts')
+            flash('User Updated Successfully!')
+            return render_template('dashboard.html', form=form, name_to_update=name_to_update)
+        except:
+            flash('Error! Looks like there was a problem! Please try again.')
+            return render_template('dashboard.html', form=form, name_to_update=name_to_update)
+    else:
+        return render_template('dashboard.html', form=form, name_to_update=name_to_update)
+    return render_template('dashboard.html')
+
+
+# localhost:5000/user/john
+@bp.route('/user/<name>')
+@use_replica
+def user(name):
+    return render_template("user.html", name=name)
+
+# Delete Database Record
+
+
+@bp.route('/delete/<int:id>', methods=['GET', 'POST'])
+@login_required
+def delete(id):
+    if id == current_user.id:
+        user_to_delete = get_user_for_update(id)
+        form = UserForm()
+        name = None
+        try:
+            db.session.delete(user_to_delete)
+            db.session.commit()
+            # Author names and bios show on post pages
+            purge_pages('/posts')
+            flash('User Deleted Successfully!')
+        except:
+            flash('Error! Looks like there was a problem! Please try again.')
+        finally:
+            our_users = Users.query.order_by(Users.date_added)
+            return render_template('add_user.html', name=name, form=form, our_users=our_users)
+    else:
+        flash('Not allowed to delete user')
+        return redirect(url_for('users.dashboard'))
+
+# Update Database Record
+
+
+@bp.route('/update/<int:id>', methods=['GET', 'POST'])
+@login_required
+def update(id):
+    form = UserForm()
+    name_to_update = get_user_for_update(id)
+    if request.method == 'POST':
+        name_to_update.name = request.form['name']
+        name_to_update.email = request.form['email']
+        name_to_update.favorite_color = request.form['favorite_color']
+        name_to_update.username = request.form['username']
+        name_to_update.about_author = request.form['about_author']
+        name_to_update.bump_version()
+        try:
+            db.session.commit()
+            # Author names and bios show on post pages
+            purge_pages('/posts')
+            flash('User Updated Successfully!')
+            return render_template('update.html', form=form, name_to_update=name_to_update)
+        except:
+            flash('Error! Looks like there was a problem! Please try again.')
+            return render_template('update.html', form=form, name_to_update=name_to_update)
+    else:
+        return render_template('update.html', form=form, id=id, name_to_update=name_to_update)
+
+
+# Get user name and email
+@bp.route('/user/add', methods=['GET', 'POST'])
+@use_replica
+def add_user():
+    form = UserForm()
+    name = None
+    # Validate Form
+    if form.validate_on_submit():
+        # A replica may not have a user who just signed up
+        use_primary()
+        user = Users.query.filter_by(email=form.email.data).first()
+        if user is None:
+            hashed_pwd = hasher.hash(form.password_hash.data)
+            user = Users(username=form.username.data, name=form.name.data, email=form.email.data,
+                         favorite_color=form.favorite_color.data,
+                         password_hash=hashed_pwd)
+            db.session.add(user)
+            db.session.commit()
+            flash("User Added Successfully")
+            form.username.data = ''
+            form.name.data = ''
+            form.email.data = ''
+            form.favorite_color.data = ''
+            form.password_hash.data = ''
+            form.password_hash2.data = ''
+        else:
+            flash("User Already Exists")
+
+        name = form.name.data
+
+    our_users = Users.query.order_by(Users.date_added)
+    return render_template('add_user.html', name=name, form=form, our_users=our_users)
+
+# Create Password Test Page
+
+
+@bp.route('/test_pw', methods=['GET', 'POST'])
+def test_pw():
+    form = PasswordForm()
+    email = None
+    password = None
+    pw_to_check = None
+    passed = None
+
+    # Validate Form
+    if form.validate_on_submit():
+        email = form.email.data
+        password_hash = form.password_hash.data
+
+        # Lookup user by email
+        pw_to_check = Users.query.filter_by(email=email).first()
+
+        # Check Hashed Password
+        passed = pw_to_check is not None and pw_to_check.verify_password(
+            form.password_hash.data)
+
+        form.email.data = ''
+        form.password_hash.data = ''
+
+        # flash("Form Submitted Successfully")
+    return render_template('test_pw.html', email=email, pw_to_check=pw_to_check, passed=passed, form=form)